@@ -2,15 +2,139 @@
 API Client for 43GPM Antidetect Browser
 """
 import requests
-from typing import Optional, Dict, List, Any
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Any, Iterator, AsyncIterator
+
+try:
+    import httpx
+except ImportError:  # Only needed by AsyncGPMClient
+    httpx = None
+
+
+def _profile_list_params(
+    group_id: Optional[str],
+    page: int,
+    per_page: int,
+    sort: int,
+    search: Optional[str]
+) -> Dict[str, Any]:
+    params = {
+        "page": page,
+        "per_page": per_page,
+        "sort": sort
+    }
+
+    if group_id:
+        params["group_id"] = group_id
+    if search:
+        params["search"] = search
+    return params
+
+
+TRANSIENT_STATUS = (429, 500, 502, 503, 504)  # Worth retrying: GPM busy or restarting
+
+# Update payload key -> field of the profile info it can be compared with
+UPDATE_INFO_FIELDS = {
+    "profile_name": "name",
+    "group_id": "group_id",
+    "raw_proxy": "raw_proxy",
+    "note": "note",
+}
+
+
+def _update_changes(data: Dict[str, Any], info: Optional[Dict[str, Any]],
+                    skip_unchanged: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Payload to send for one profile update.
+
+    With skip_unchanged, only the part that differs from the known profile
+    info (None when nothing would change); fields the info does not carry
+    (user_agent, is_noise_*...) cannot be compared and are always sent. The
+    update API requires profile_name, so it is filled in from info when the
+    caller did not set it.
+    """
+    changes = dict(data)
+    if skip_unchanged and info:
+        changes = {}
+        for key, value in data.items():
+            field = UPDATE_INFO_FIELDS.get(key)
+            if field is None or str(info.get(field) or "") != str(value or ""):
+                changes[key] = value
+        if not changes:
+            return None
+    if "profile_name" not in changes and info and info.get("name"):
+        changes["profile_name"] = info["name"]
+    return changes
+
+
+def _known_infos(known, profile_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Cached infos from a {profile_id: info} dict or a ProfileIndex (one query), missing ids left out"""
+    if known is None or not profile_ids:
+        return {}
+    try:
+        if hasattr(known, "get_many"):
+            return known.get_many(profile_ids)
+        return {pid: known[pid] for pid in profile_ids if known.get(pid)}
+    except Exception as e:
+        print(f"Error reading cached profile info: {e}")
+        return {}
+
+
+def _remember_updates(known, updated: List[tuple]):
+    """Reflect successful (profile_id, info, changes) updates in the cache so the next diff sees them"""
+    if known is None:
+        return
+    infos = {}
+    for profile_id, info, changes in updated:
+        if info is None:
+            continue
+        merged = dict(info)
+        for key, value in changes.items():
+            merged[UPDATE_INFO_FIELDS.get(key, key)] = value
+        infos[profile_id] = merged
+    if not infos:
+        return
+    try:
+        if hasattr(known, "upsert"):
+            known.upsert(infos.values())
+        elif isinstance(known, dict):
+            known.update(infos)
+    except Exception as e:
+        print(f"Error caching updated profiles: {e}")
+
+
+def _no_name_result(profile_id: str) -> Dict[str, Any]:
+    return {"profile_id": profile_id, "success": False, "skipped": False,
+            "message": "Profile info unavailable: profile_name is required", "attempts": 0}
+
+
+def _bulk_summary(results: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    return {
+        "summary": {
+            "total": len(results),
+            "updated": sum(1 for r in results if r["success"] and not r["skipped"]),
+            "skipped": sum(1 for r in results if r["skipped"]),
+            "failed": sum(1 for r in results if not r["success"]),
+            "seconds": round(time.monotonic() - started, 3),
+        },
+        "results": results,
+    }
 
 
 class GPMClient:
     """Client for interacting with GPM Login API"""
     
-    def __init__(self, base_url: str = "http://127.0.0.1:19995"):
+    def __init__(self, base_url: str = "http://127.0.0.1:19995", pool_size: int = 32):
         self.base_url = base_url
         self.session = requests.Session()
+        # Keep enough keep-alive connections for concurrent bulk calls (requests defaults to 10)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def get_groups(self) -> List[Dict[str, Any]]:
         """
@@ -51,34 +175,124 @@ class GPMClient:
         Returns:
             Dict with 'data' (profiles list) and 'pagination' info
         """
-        params = {
-            "page": page,
-            "per_page": per_page,
-            "sort": sort
-        }
-        
-        if group_id:
-            params["group_id"] = group_id
-        if search:
-            params["search"] = search
-            
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/v3/profiles",
-                params=params
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get("success"):
-                return {
-                    "data": result.get("data", []),
-                    "pagination": result.get("pagination", {})
-                }
-            return {"data": [], "pagination": {}}
+            return self._fetch_profiles_page(group_id, page, per_page, sort, search)
         except Exception as e:
             print(f"Error getting profiles: {e}")
             return {"data": [], "pagination": {}}
+
+    def _fetch_profiles_page(
+        self,
+        group_id: Optional[str],
+        page: int,
+        per_page: int,
+        sort: int,
+        search: Optional[str]
+    ) -> Dict[str, Any]:
+        """Fetch one page of profiles, raising on connection errors and GPM refusals"""
+        response = self.session.get(
+            f"{self.base_url}/api/v3/profiles",
+            params=_profile_list_params(group_id, page, per_page, sort, search)
+        )
+        response.raise_for_status()
+        result = response.json()
+
+        if result.get("success") and "pagination" in result:
+            return {
+                "data": result.get("data", []),
+                "pagination": result["pagination"]
+            }
+        # Never pass a refusal off as an empty page: callers would think the profiles are gone
+        raise RuntimeError(f"GPM did not return a profile page: {result.get('message', 'Unknown error')}")
+
+    def count_profiles(self, group_id: Optional[str] = None) -> int:
+        """Total number of profiles (in a group) according to GPM, raising on errors"""
+        pagination = self._fetch_profiles_page(group_id, 1, 1, 1, None)["pagination"]
+        if "total" not in pagination:
+            raise RuntimeError("GPM profile list has no total")
+        return int(pagination["total"])
+
+    def iter_profiles(
+        self,
+        group_id: Optional[str] = None,
+        search: Optional[str] = None,
+        page_size: int = 100,
+        sort: int = 1,
+        prefetch: int = 4
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every profile matching the filters, page by page
+        
+        The first page tells us 'total_page'; the next `prefetch` pages are then
+        requested concurrently while the current page is being consumed.
+        
+        Args:
+            group_id: Filter by group ID
+            search: Search keyword for profile name
+            page_size: Profiles per request
+            sort: Defaults to 1 (old to new) so new profiles don't shift pages
+            prefetch: Number of pages requested ahead
+            
+        Yields:
+            Profile dicts, in page order
+        """
+        first = self._fetch_profiles_page(group_id, 1, page_size, sort, search)
+        yield from first["data"]
+
+        total_page = first["pagination"].get("total_page", 1)
+        if total_page <= 1:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, prefetch)) as pool:
+            pending = {}
+            next_page = 2
+            for page in range(2, total_page + 1):
+                while next_page <= total_page and next_page < page + max(1, prefetch):
+                    pending[next_page] = pool.submit(
+                        self._fetch_profiles_page, group_id, next_page, page_size, sort, search
+                    )
+                    next_page += 1
+                yield from pending.pop(page).result()["data"]
+
+    def all_profiles(
+        self,
+        group_id: Optional[str] = None,
+        search: Optional[str] = None,
+        page_size: int = 100,
+        snapshot_path: Optional[str] = None,
+        max_age: float = 300
+    ) -> List[Dict[str, Any]]:
+        """
+        Get every profile matching the filters as a list
+        
+        Args:
+            group_id: Filter by group ID
+            search: Search keyword for profile name
+            page_size: Profiles per request
+            snapshot_path: Optional JSON file used as an on-disk cache
+            max_age: Seconds before the snapshot is considered stale
+            
+        Returns:
+            List of profile dicts
+        """
+        if snapshot_path and os.path.exists(snapshot_path):
+            if time.time() - os.path.getmtime(snapshot_path) < max_age:
+                try:
+                    with open(snapshot_path, "r", encoding="utf-8") as f:
+                        snapshot = json.load(f)
+                    if snapshot.get("group_id") == group_id and snapshot.get("search") == search:
+                        return snapshot["data"]
+                except (OSError, ValueError, KeyError):
+                    pass
+
+        profiles = list(self.iter_profiles(group_id=group_id, search=search, page_size=page_size))
+
+        if snapshot_path:
+            tmp_path = f"{snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"group_id": group_id, "search": search, "data": profiles}, f, ensure_ascii=False)
+            os.replace(tmp_path, snapshot_path)
+        return profiles
     
     def get_profile_info(self, profile_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -189,3 +403,373 @@ class GPMClient:
                 "message": f"Connection error: {str(e)}"
             }
 
+    def update_profile(
+        self,
+        profile_id: str,
+        data: Dict[str, Any],
+        retries: int = 2,
+        timeout: float = 10
+    ) -> Dict[str, Any]:
+        """
+        Update a profile (POST /api/v3/profiles/update/{id})
+        
+        Args:
+            profile_id: Profile ID
+            data: Fields to change: profile_name, group_id, raw_proxy, startup_urls,
+                note, color, user_agent, is_noise_canvas, is_noise_webgl,
+                is_noise_client_rect, is_noise_audio_context
+            retries: Extra attempts on connection errors / 429 / 5xx
+            timeout: Seconds per attempt
+            
+        Returns:
+            Dict with:
+                - success: bool
+                - message: Success or error message
+                - attempts: Requests made
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/v3/profiles/update/{profile_id}",
+                    json=data,
+                    timeout=timeout
+                )
+                if response.status_code in TRANSIENT_STATUS and attempt <= retries:
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+                    continue
+                response.raise_for_status()
+                result = response.json()
+                return {
+                    "success": result.get("success", False),
+                    "message": result.get("message", "Unknown error"),
+                    "attempts": attempt
+                }
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt <= retries:
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+                    continue
+                print(f"Error updating profile: {e}")
+                return {"success": False, "message": f"Connection error: {str(e)}", "attempts": attempt}
+            except Exception as e:
+                print(f"Error updating profile: {e}")
+                return {"success": False, "message": str(e), "attempts": attempt}
+
+    def bulk_update_profiles(
+        self,
+        updates: Dict[str, Dict[str, Any]],
+        concurrency: int = 16,
+        skip_unchanged: bool = True,
+        known=None,
+        retries: int = 2
+    ) -> Dict[str, Any]:
+        """
+        Apply many profile updates concurrently over the pooled connections
+        
+        Args:
+            updates: profile_id -> update data (see update_profile)
+            concurrency: Requests in flight at once
+            skip_unchanged: Drop fields that already have the requested value and
+                skip profiles with nothing left to change
+            known: Cached profile info for the diff: a {profile_id: info} dict or a
+                profile_index.ProfileIndex (refreshed with the successful updates).
+                Profiles it does not cover get their info fetched from GPM, which
+                also supplies the required profile_name when data lacks it.
+            retries: Extra attempts per profile on transient failures
+            
+        Returns:
+            Dict with 'summary' (total/updated/skipped/failed/seconds) and
+            'results' (one {profile_id, success, skipped, message, attempts} per profile, input order)
+        """
+        started = time.monotonic()
+        cached = _known_infos(known, list(updates))
+        updated = []
+
+        def apply(profile_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+            info = cached.get(profile_id)
+            if info is None and (skip_unchanged or "profile_name" not in data):
+                info = self.get_profile_info(profile_id)
+            changes = _update_changes(data, info, skip_unchanged)
+            if changes is None:
+                return {"profile_id": profile_id, "success": True, "skipped": True,
+                        "message": "No changes", "attempts": 0}
+            if "profile_name" not in changes:
+                return _no_name_result(profile_id)
+            result = self.update_profile(profile_id, changes, retries=retries)
+            if result["success"]:
+                updated.append((profile_id, info, changes))
+            return {"profile_id": profile_id, "skipped": False, **result}
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = [pool.submit(apply, pid, data) for pid, data in updates.items()]
+            results = [f.result() for f in futures]
+        _remember_updates(known, updated)
+        return _bulk_summary(results, started)
+
+
+class AsyncGPMClient:
+    """
+    Asyncio client for the GPM Login API.
+
+    Mirrors GPMClient (same methods and return shapes) but never blocks the
+    event loop. Connections are pooled by a shared httpx.AsyncClient; every
+    method accepts a per-call timeout.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:19995",
+        timeout: float = 10.0,
+        start_timeout: float = 60.0,
+        max_connections: int = 50
+    ):
+        if httpx is None:
+            raise ImportError("AsyncGPMClient requires httpx: pip install httpx")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.start_timeout = start_timeout  # Launching a browser is much slower than a lookup
+        self.session = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = await self.session.get(
+            path,
+            params=params,
+            timeout=timeout if timeout is not None else self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_groups(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Get list of profile groups (see GPMClient.get_groups)"""
+        try:
+            result = await self._get("/api/v3/groups", timeout=timeout)
+            if result.get("success"):
+                return result.get("data", [])
+            return []
+        except Exception as e:
+            print(f"Error getting groups: {e}")
+            return []
+
+    async def get_profiles(
+        self,
+        group_id: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 100,
+        sort: int = 0,
+        search: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Get list of profiles (see GPMClient.get_profiles)"""
+        try:
+            return await self._fetch_profiles_page(group_id, page, per_page, sort, search, timeout)
+        except Exception as e:
+            print(f"Error getting profiles: {e}")
+            return {"data": [], "pagination": {}}
+
+    async def _fetch_profiles_page(
+        self,
+        group_id: Optional[str],
+        page: int,
+        per_page: int,
+        sort: int,
+        search: Optional[str],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Fetch one page of profiles, raising on connection errors and GPM refusals"""
+        result = await self._get(
+            "/api/v3/profiles",
+            params=_profile_list_params(group_id, page, per_page, sort, search),
+            timeout=timeout
+        )
+        if result.get("success") and "pagination" in result:
+            return {
+                "data": result.get("data", []),
+                "pagination": result["pagination"]
+            }
+        raise RuntimeError(f"GPM did not return a profile page: {result.get('message', 'Unknown error')}")
+
+    async def iter_profiles(
+        self,
+        group_id: Optional[str] = None,
+        search: Optional[str] = None,
+        page_size: int = 100,
+        sort: int = 1,
+        prefetch: int = 4
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every profile matching the filters (see GPMClient.iter_profiles)"""
+        first = await self._fetch_profiles_page(group_id, 1, page_size, sort, search)
+        for profile in first["data"]:
+            yield profile
+
+        total_page = first["pagination"].get("total_page", 1)
+        pending = {}
+        next_page = 2
+        try:
+            for page in range(2, total_page + 1):
+                while next_page <= total_page and next_page < page + max(1, prefetch):
+                    pending[next_page] = asyncio.ensure_future(
+                        self._fetch_profiles_page(group_id, next_page, page_size, sort, search)
+                    )
+                    next_page += 1
+                result = await pending.pop(page)
+                for profile in result["data"]:
+                    yield profile
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+    async def get_profile_info(self, profile_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Get detailed information of a specific profile (see GPMClient.get_profile_info)"""
+        try:
+            result = await self._get(f"/api/v3/profiles/{profile_id}", timeout=timeout)
+            if result.get("success"):
+                return result.get("data")
+            return None
+        except Exception as e:
+            print(f"Error getting profile info: {e}")
+            return None
+
+    async def start_profile(
+        self,
+        profile_id: str,
+        win_scale: Optional[float] = None,
+        win_pos: Optional[str] = None,
+        win_size: Optional[str] = None,
+        additional_args: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Start/Open a profile browser (see GPMClient.start_profile)"""
+        params = {}
+        if win_scale is not None:
+            params["win_scale"] = win_scale
+        if win_pos:
+            params["win_pos"] = win_pos
+        if win_size:
+            params["win_size"] = win_size
+        if additional_args:
+            params["additional_args"] = additional_args
+
+        try:
+            result = await self._get(
+                f"/api/v3/profiles/start/{profile_id}",
+                params=params,
+                timeout=timeout if timeout is not None else self.start_timeout
+            )
+            return {
+                "success": result.get("success", False),
+                "data": result.get("data"),
+                "message": result.get("message", "Unknown error")
+            }
+        except Exception as e:
+            print(f"Error starting profile: {e}")
+            return {
+                "success": False,
+                "data": None,
+                "message": f"Connection error: {str(e)}"
+            }
+
+    async def close_profile(self, profile_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Close a profile browser (see GPMClient.close_profile)"""
+        try:
+            result = await self._get(f"/api/v3/profiles/close/{profile_id}", timeout=timeout)
+            return {
+                "success": result.get("success", False),
+                "message": result.get("message", "Unknown error")
+            }
+        except Exception as e:
+            print(f"Error closing profile: {e}")
+            return {
+                "success": False,
+                "message": f"Connection error: {str(e)}"
+            }
+
+    async def update_profile(
+        self,
+        profile_id: str,
+        data: Dict[str, Any],
+        retries: int = 2,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Update a profile (see GPMClient.update_profile)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self.session.post(
+                    f"/api/v3/profiles/update/{profile_id}",
+                    json=data,
+                    timeout=timeout if timeout is not None else self.timeout
+                )
+                if response.status_code in TRANSIENT_STATUS and attempt <= retries:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                    continue
+                response.raise_for_status()
+                result = response.json()
+                return {
+                    "success": result.get("success", False),
+                    "message": result.get("message", "Unknown error"),
+                    "attempts": attempt
+                }
+            except httpx.TransportError as e:
+                if attempt <= retries:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                    continue
+                print(f"Error updating profile: {e}")
+                return {"success": False, "message": f"Connection error: {str(e)}", "attempts": attempt}
+            except Exception as e:
+                print(f"Error updating profile: {e}")
+                return {"success": False, "message": str(e), "attempts": attempt}
+
+    async def bulk_update_profiles(
+        self,
+        updates: Dict[str, Dict[str, Any]],
+        concurrency: int = 16,
+        skip_unchanged: bool = True,
+        known=None,
+        retries: int = 2
+    ) -> Dict[str, Any]:
+        """Apply many profile updates concurrently (see GPMClient.bulk_update_profiles)"""
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        # One cache read up front and one write at the end, both off the event loop (ProfileIndex is SQLite)
+        cached = await asyncio.to_thread(_known_infos, known, list(updates))
+        updated = []
+
+        async def apply(profile_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                info = cached.get(profile_id)
+                if info is None and (skip_unchanged or "profile_name" not in data):
+                    info = await self.get_profile_info(profile_id)
+                changes = _update_changes(data, info, skip_unchanged)
+                if changes is None:
+                    return {"profile_id": profile_id, "success": True, "skipped": True,
+                            "message": "No changes", "attempts": 0}
+                if "profile_name" not in changes:
+                    return _no_name_result(profile_id)
+                result = await self.update_profile(profile_id, changes, retries=retries)
+                if result["success"]:
+                    updated.append((profile_id, info, changes))
+                return {"profile_id": profile_id, "skipped": False, **result}
+
+        results = await asyncio.gather(*(apply(pid, data) for pid, data in updates.items()))
+        await asyncio.to_thread(_remember_updates, known, updated)
+        return _bulk_summary(list(results), started)
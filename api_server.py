@@ -4,23 +4,86 @@ FastAPI Server for 43GPM External Automation
 Supports:
 1. Manual Port: /execute/{project}?port=9222
 2. Auto Port (via Profile ID): /execute/{project}?profile_id=xxx
+3. Job status: /jobs/{job_id} (cancel: DELETE /jobs/{job_id})
+4. Loaded projects: /projects (force reload: POST /projects/{project}/reload)
+5. Close profile: POST /profiles/{profile_id}/close
+   Profiles opened by the server: /debug/profiles (closed after GPM_PROFILE_IDLE_TIMEOUT,
+   at most GPM_MAX_OPEN_PROFILES open, least recently used idle profile evicted first)
+6. Profile list from the local index: /profiles?group_id=xxx&proxy=yyy (re-sync: POST /profiles/sync)
+   Bulk profile update: POST /profiles/bulk-update
+7. Batch: POST /execute/{project}/batch, status at /batches/{batch_id}
+8. Job history: /jobs?status=failed&project=xxx&profile_id=yyy (persisted in SQLite, GPM_JOB_DB)
+9. Live progress (Server-Sent Events): /jobs/{job_id}/events, all jobs: /events
+10. Prometheus metrics: /metrics
+11. Debug caches: /debug/profile-cache (profile addresses), /debug/drivers (pooled WebDriver
+    sessions), /debug/locators (locator hit counts behind the adaptive fallback order)
+
+Jobs are executed by a bounded worker pool fed by a priority queue.
+Tune it with the GPM_MAX_WORKERS and GPM_MAX_QUEUE environment variables.
+GPM_RUN_MODE=process runs every job in a pooled worker process that is
+killed and recycled when the job exceeds its timeout (GPM_JOB_TIMEOUT) or is cancelled.
 """
 import encoding_fix
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any
+import asyncio
 import importlib.util
 from pathlib import Path
+import hashlib
+import itertools
+import json
+import multiprocessing
+import threading
 import logging
+import queue
+import time
+import uuid
+import os
 import uvicorn
-import socket
-from api_client import GPMClient
+from api_client import AsyncGPMClient, GPMClient
+from driver_pool import DriverPool
+from job_store import JobStore
+from profile_index import ProfileIndex
+from profile_manager import ProfileCapacityError, ProfileLifecycleManager
+from port_probe import check_port, listener_started_at, probe_port, split_address, wait_port_ready
+import element_wait
+import events
+import gpm_runtime
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("API_Server")
 
-app = FastAPI(title="43GPM External Automation API")
-gpm_client = GPMClient() # Default to 127.0.0.1:19995
+MAX_WORKERS = int(os.getenv("GPM_MAX_WORKERS", "4"))       # Concurrent Selenium sessions
+MAX_QUEUE_SIZE = int(os.getenv("GPM_MAX_QUEUE", "500"))    # Queued jobs before returning 429
+JOB_HISTORY_LIMIT = 1000                                   # Finished jobs kept for /jobs lookups
+RUN_MODE = os.getenv("GPM_RUN_MODE", "thread")             # "thread" or "process"
+JOB_TIMEOUT = float(os.getenv("GPM_JOB_TIMEOUT", "600"))   # Default wall-clock limit per job (process mode)
+PROFILE_CACHE_TTL = float(os.getenv("GPM_PROFILE_CACHE_TTL", "300"))  # Seconds to trust a started profile's port
+BATCH_START_CONCURRENCY = int(os.getenv("GPM_BATCH_START_CONCURRENCY", "8"))  # Parallel GPM starts per batch
+PORT_READY_TIMEOUT = float(os.getenv("GPM_PORT_READY_TIMEOUT", "15"))  # Max wait for a fresh profile's debug port
+MANUAL_PORT_TIMEOUT = float(os.getenv("GPM_MANUAL_PORT_TIMEOUT", "1.5"))  # Manual ports belong to already open browsers
+DRIVER_IDLE_TIMEOUT = float(os.getenv("GPM_DRIVER_IDLE_TIMEOUT", "300"))  # Seconds before an idle WebDriver is quit
+PROFILE_IDLE_TIMEOUT = float(os.getenv("GPM_PROFILE_IDLE_TIMEOUT", "300"))  # Close server-opened profiles unused this long
+MAX_OPEN_PROFILES = int(os.getenv("GPM_MAX_OPEN_PROFILES", "20"))  # Browsers the server may keep open (0 = unlimited)
+PROFILE_SLOT_TIMEOUT = float(os.getenv("GPM_PROFILE_SLOT_TIMEOUT", "60"))  # Max wait for a free browser slot
+BATCH_HISTORY_LIMIT = 100                                  # Batches kept for /batches lookups
+JOB_DB_PATH = os.getenv("GPM_JOB_DB", str(Path(__file__).parent / "jobs.db"))  # Persistent job history
+JOB_RETENTION_DAYS = float(os.getenv("GPM_JOB_RETENTION_DAYS", "7"))  # Finished jobs older than this are pruned
+PROFILE_INDEX_PATH = os.getenv("GPM_PROFILE_INDEX", str(Path(__file__).parent / "profiles.db"))  # Local profile/group index
+PROFILE_INDEX_MAX_AGE = float(os.getenv("GPM_PROFILE_INDEX_MAX_AGE", "300"))  # Re-sync the index when older than this
+PROFILE_INDEX_FULL_SYNC = float(os.getenv("GPM_PROFILE_INDEX_FULL_SYNC", "86400"))  # Full re-scan (edits, deletions)
+SSE_HEARTBEAT = 15                                         # Seconds between keep-alive comments on idle streams
+SENSITIVE_PARAM_KEYS = ("password", "mnemonic", "seed", "private_key", "secret", "token")  # Never persisted
+
+gpm_client = AsyncGPMClient() # Default to 127.0.0.1:19995
+profile_index = ProfileIndex(GPMClient(gpm_client.base_url), PROFILE_INDEX_PATH, full_sync_interval=PROFILE_INDEX_FULL_SYNC)
 
 class AutomationRequest(BaseModel):
     remote_debugging_address: str
@@ -28,51 +91,782 @@ class AutomationRequest(BaseModel):
     profile_id: str = "external_id"
     driver_path: str = ""
 
-def check_port(host: str, port: int) -> bool:
-    """Verify if a port is listening"""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(1)
-    result = sock.connect_ex((host, port))
-    sock.close()
-    return result == 0
+class BatchRequest(BaseModel):
+    profile_ids: List[str] = []
+    group_id: Optional[str] = None
+    # Extra filters on the group/all profiles, answered by the local profile index
+    proxy: Optional[str] = None
+    note: Optional[str] = None
+    browser_version: Optional[str] = None
+    params: Dict[str, Any] = {}
+    priority: int = 0
+    concurrency: int = BATCH_START_CONCURRENCY
+    timeout: Optional[float] = None
+
+
+class BulkUpdateRequest(BaseModel):
+    updates: Dict[str, Dict[str, Any]]  # profile_id -> fields (profile_name, group_id, raw_proxy, note, ...)
+    concurrency: int = 16
+    skip_unchanged: bool = True
+
+
+class ProfileAddressCache:
+    """
+    TTL cache of profile_id -> (remote_debugging_address, driver_path).
+
+    Lets repeated jobs on an already running profile skip the GPM start call.
+    Entries are only served while the debug port still answers.
+    """
+
+    def __init__(self, ttl: float = PROFILE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}  # profile_id -> (address, driver_path, cached_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, profile_id: str):
+        """Return (address, driver_path) if cached, fresh and alive, else None"""
+        with self._lock:
+            entry = self._entries.get(profile_id)
+        if entry:
+            address, driver_path, cached_at = entry
+            if time.time() - cached_at < self.ttl and check_port(*split_address(address)):
+                self.hits += 1
+                return address, driver_path
+            self.invalidate(profile_id)
+        self.misses += 1
+        return None
+
+    def put(self, profile_id: str, address: str, driver_path: str):
+        with self._lock:
+            self._entries[profile_id] = (address, driver_path, time.time())
+
+    def invalidate(self, profile_id: str):
+        with self._lock:
+            self._entries.pop(profile_id, None)
+
+    def peek(self, profile_id: str) -> Optional[str]:
+        """Cached address without expiry or liveness checks"""
+        with self._lock:
+            entry = self._entries.get(profile_id)
+        return entry[0] if entry else None
+
+    def driver_path(self, profile_id: str) -> str:
+        with self._lock:
+            entry = self._entries.get(profile_id)
+        return entry[1] if entry else ""
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            entries = {
+                profile_id: {
+                    "remote_debugging_address": address,
+                    "driver_path": driver_path,
+                    "age": round(now - cached_at, 1),
+                    "expires_in": round(max(0.0, self.ttl - (now - cached_at)), 1),
+                }
+                for profile_id, (address, driver_path, cached_at) in self._entries.items()
+            }
+        return {"ttl": self.ttl, "hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+profile_cache = ProfileAddressCache()
+driver_pool = DriverPool(idle_timeout=DRIVER_IDLE_TIMEOUT)
+gpm_runtime.use_pool(driver_pool)  # Scripts attaching through gpm_runtime share the server's pool
+
+
+class ProjectRegistry:
+    """
+    Cache of loaded project modules.
+
+    Each script is executed once and reused until its file changes. A change is
+    detected by mtime/size first; the content hash decides whether it really
+    needs to be re-executed (e.g. a touched but unmodified file).
+    """
+
+    def __init__(self, project_dir: str = "project"):
+        self.project_dir = Path(project_dir)
+        self._modules = {}  # name -> dict(module, path, mtime_ns, size, sha1, loaded_at)
+        self._lock = threading.Lock()
+
+    def get(self, project_name: str):
+        """Return the module for project_name, loading or reloading it if needed"""
+        project_path = self.project_dir / f"{project_name}.py"
+        if not project_path.exists():
+            raise RuntimeError(f"Project {project_name} not found")
+
+        with self._lock:
+            stat = project_path.stat()
+            entry = self._modules.get(project_name)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return entry["module"]
+
+            sha1 = hashlib.sha1(project_path.read_bytes()).hexdigest()
+            if entry and entry["sha1"] == sha1:
+                entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+                return entry["module"]
+
+            return self._load(project_name, project_path, stat, sha1)
+
+    def reload(self, project_name: str):
+        """Force a fresh import of project_name"""
+        with self._lock:
+            self._modules.pop(project_name, None)
+        return self.get(project_name)
+
+    def list(self) -> Dict[str, Any]:
+        available = sorted(p.stem for p in self.project_dir.glob("*.py"))
+        loaded = {
+            name: {
+                "path": str(entry["path"]),
+                "sha1": entry["sha1"],
+                "loaded_at": entry["loaded_at"],
+            }
+            for name, entry in self._modules.items()
+        }
+        return {"available": available, "loaded": loaded}
+
+    def _load(self, project_name: str, project_path: Path, stat, sha1: str):
+        print(f">>> [DEBUG] Loading project module {project_name} ({sha1[:8]})")
+        spec = importlib.util.spec_from_file_location(project_name, project_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self._modules[project_name] = {
+            "module": module,
+            "path": project_path,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": sha1,
+            "loaded_at": time.time(),
+        }
+        return module
+
+
+project_registry = ProjectRegistry()
+
 
 def run_automation_task(project_name: str, data: AutomationRequest, extra_params: dict = None):
-    """Function to run automation in background"""
+    """Run a project script against a browser and return what run() returned. Raises on failure."""
+    # Double check port before passing to Selenium
+    host, port = split_address(data.remote_debugging_address)
+    with metrics.span("port_check"):
+        port_open = check_port(host, port)
+    if not port_open:
+        profile_cache.invalidate(data.profile_id)
+        driver_pool.invalidate(data.remote_debugging_address)
+        raise RuntimeError(f"Connection lost to port {port}")
+
+    # Load project module (cached, reloaded only when the file changes)
+    with metrics.span("module_load"):
+        project_module = project_registry.get(project_name)
+
+    if not hasattr(project_module, 'run'):
+        raise RuntimeError(f"No run() function in {project_name}")
+
+    print(f">>> [DEBUG] Executing {project_name} on {data.remote_debugging_address}")
+    profile_data = {
+        "profile_id": data.profile_id,
+        "profile_name": data.profile_name,
+        "remote_debugging_address": data.remote_debugging_address,
+        "browser_location": "",
+        "driver_path": data.driver_path
+    }
+    # Merge extra parameters
+    if extra_params:
+        profile_data.update(extra_params)
+
+    # Selenium projects opt in with USE_DRIVER_POOL = True and get an attached driver
+    if not getattr(project_module, "USE_DRIVER_POOL", False):
+        with metrics.span("script_run"):
+            return project_module.run(profile_data)
+
+    with metrics.span("driver_attach"):
+        driver = driver_pool.acquire(data.remote_debugging_address, data.driver_path)
+    profile_data["driver"] = driver
     try:
-        project_path = Path(f"project/{project_name}.py")
-        if not project_path.exists():
-            print(f">>> [ERROR] Project {project_name} not found")
+        with metrics.span("script_run"):
+            return project_module.run(profile_data)
+    finally:
+        driver_pool.release(driver)
+
+
+def redact_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of params with secrets (passwords, mnemonics, ...) masked for storage and API output"""
+    return {
+        key: "***" if any(s in key.lower() for s in SENSITIVE_PARAM_KEYS) else value
+        for key, value in (params or {}).items()
+    }
+
+
+def json_safe(value: Any) -> Any:
+    """Script results are stored and returned as JSON; anything else becomes its str()"""
+    return json.loads(json.dumps(value, default=str))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has reached MAX_QUEUE_SIZE"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when a running job was cancelled"""
+
+
+@dataclass
+class Job:
+    """A single automation run tracked by the scheduler"""
+    project_name: str
+    data: AutomationRequest
+    extra_params: Dict[str, Any] = field(default_factory=dict)
+    priority: int = 0
+    timeout: float = JOB_TIMEOUT
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued / running / done / failed / cancelled
+    cancel_requested: bool = False
+    error: Optional[str] = None
+    result: Any = None  # Return value of the script's run()
+    holds_profile: bool = False  # Job counts as a user of a manager-opened profile until it ends
+    coalesced: int = 0  # Identical submissions merged into this job while it was queued
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, float] = field(default_factory=dict)  # stage -> seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "project": self.project_name,
+            "profile_id": self.data.profile_id,
+            "address": self.data.remote_debugging_address,
+            "params": redact_params(self.extra_params),
+            "priority": self.priority,
+            "timeout": self.timeout,
+            "status": self.status,
+            "error": self.error,
+            "result": self.result,
+            "coalesced": self.coalesced,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages": self.stages,
+        }
+
+    @property
+    def browser_key(self) -> str:
+        """Jobs with the same key drive the same browser and must never overlap"""
+        return self.data.remote_debugging_address
+
+    @property
+    def dedupe_key(self) -> tuple:
+        return (self.browser_key, self.project_name, json.dumps(self.extra_params, sort_keys=True, default=str))
+
+
+class JobScheduler:
+    """
+    Bounded worker pool fed by a priority queue.
+
+    Lower priority values run first; jobs with equal priority run in FIFO order.
+    submit() raises QueueFullError once max_queue_size jobs are waiting.
+
+    Jobs on the same browser are serialized: a job dequeued while another job
+    holds its browser is parked in a per-browser FIFO and re-queued (with its
+    original order) when the browser is handed over. Different browsers run
+    fully in parallel. Submitting a job identical to one still queued (same
+    browser, project and params) returns the queued job instead.
+
+    In "process" run mode each worker thread drives its own child process
+    (see job_worker.py) and kills/recycles it on timeout or cancellation.
+
+    Every status change is handed to the job store (if any), which persists
+    it asynchronously, and published on the event bus for live streams.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue_size: int = MAX_QUEUE_SIZE,
+                 run_mode: str = RUN_MODE, store: Optional[JobStore] = None):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.run_mode = run_mode
+        self.store = store
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs = OrderedDict()  # job_id -> Job
+        self._lock = threading.Lock()
+        self._workers = []
+        self._processes = {}  # worker thread name -> (Process, Connection)
+        self._running = 0
+        self._owners = {}     # browser_key -> job currently holding (or next in line for) the browser
+        self._parked = {}     # browser_key -> deque of (priority, seq, job) waiting for it
+        self._pending = {}    # dedupe_key -> queued job, for coalescing
+
+    def start(self):
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Job scheduler started with {self.max_workers} workers (queue limit {self.max_queue_size})")
+
+    def stop(self):
+        # Sentinels sort after every real job so queued work drains first
+        for _ in self._workers:
+            self._queue.put((float("inf"), next(self._seq), None))
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+        for name in list(self._processes):
+            self._kill_process(name)
+
+    def is_full(self) -> bool:
+        return self._waiting_count() >= self.max_queue_size
+
+    def _waiting_count(self) -> int:
+        return self._queue.qsize() + sum(len(parked) for parked in self._parked.values())
+
+    def submit(self, project_name: str, data: AutomationRequest,
+               extra_params: Optional[dict] = None, priority: int = 0,
+               stages: Optional[Dict[str, float]] = None, timeout: Optional[float] = None,
+               holds_profile: bool = False) -> Job:
+        job = Job(project_name=project_name, data=data, extra_params=extra_params or {},
+                  priority=priority, stages=dict(stages or {}), timeout=timeout or JOB_TIMEOUT,
+                  holds_profile=holds_profile)
+        with self._lock:
+            duplicate = self._pending.get(job.dedupe_key)
+            if duplicate and duplicate.status == "queued":
+                duplicate.coalesced += 1
+            else:
+                duplicate = None
+                if self.is_full():
+                    raise QueueFullError(f"Job queue is full ({self.max_queue_size} jobs waiting)")
+                self._jobs[job.id] = job
+                self._pending[job.dedupe_key] = job
+                self._prune_history()
+                self._queue.put((priority, next(self._seq), job))
+        if duplicate:
+            print(f">>> [DEBUG] Coalesced duplicate {project_name} job into {duplicate.id[:8]}")
+            if holds_profile:
+                profile_manager.release(data.profile_id)  # The queued job already holds the profile
+            return duplicate
+        self._status_changed(job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a job. Queued jobs are skipped when dequeued; running jobs are
+        killed in process mode. Raises KeyError / ValueError when not possible.
+        """
+        job = self._jobs.get(job_id)
+        if not job:
+            raise KeyError(job_id)
+        with self._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self._forget_pending(job)
+                self._status_changed(job)
+                return job
+            if job.status != "running":
+                raise ValueError(f"Job already {job.status}")
+            if self.run_mode != "process":
+                raise ValueError("Running jobs can only be cancelled in process run mode")
+            job.cancel_requested = True
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "queued": self._waiting_count(),
+            "busy_browsers": len(self._owners),
+            "running": self._running,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    def _forget_pending(self, job: Job):
+        if self._pending.get(job.dedupe_key) is job:
+            del self._pending[job.dedupe_key]
+
+    def _claim_browser(self, priority, seq, job: Job) -> bool:
+        """Take job's browser, or park the job behind the current holder. Call with _lock held."""
+        key = job.browser_key
+        owner = self._owners.get(key)
+        if owner is not None and owner is not job:
+            self._parked.setdefault(key, deque()).append((priority, seq, job))
+            return False
+        self._owners[key] = job
+        return True
+
+    def _hand_over_browser(self, key: str):
+        """Give the browser to the oldest parked job (re-queued in its original order). Call with _lock held."""
+        parked = self._parked.get(key)
+        while parked:
+            entry = parked.popleft()
+            if entry[2].status == "cancelled":
+                continue
+            self._owners[key] = entry[2]
+            self._queue.put(entry)
+            break
+        else:
+            self._owners.pop(key, None)
+        if parked is not None and not parked:
+            del self._parked[key]
+
+    def _status_changed(self, job: Job):
+        if self.store:
+            self.store.save(job.to_dict())
+        events.publish("job", job_id=job.id, project=job.project_name, status=job.status, error=job.error)
+        if job.holds_profile and job.status in events.TERMINAL_STATUSES:
+            job.holds_profile = False
+            profile_manager.release(job.data.profile_id)
+
+    def _prune_history(self):
+        """Drop the oldest finished jobs once the history limit is exceeded"""
+        excess = len(self._jobs) - JOB_HISTORY_LIMIT
+        if excess <= 0:
             return
+        for job_id in [j.id for j in self._jobs.values() if j.status in ("done", "failed", "cancelled")][:excess]:
+            del self._jobs[job_id]
+
+    def _worker_loop(self):
+        while True:
+            priority, seq, job = self._queue.get()
+            if job is None:
+                break
+            with self._lock:
+                if job.status == "cancelled":
+                    if self._owners.get(job.browser_key) is job:
+                        self._hand_over_browser(job.browser_key)
+                    continue
+                if not self._claim_browser(priority, seq, job):
+                    continue
+                self._forget_pending(job)
+                job.status = "running"
+                job.started_at = time.time()
+                self._running += 1
+            self._status_changed(job)
+            with metrics.job_context(job.project_name, job.stages, job.id):
+                metrics.record_stage("queue_wait", job.started_at - job.created_at)
+                try:
+                    if self.run_mode == "process":
+                        job.result = self._run_in_process(job)
+                    else:
+                        job.result = json_safe(run_automation_task(job.project_name, job.data, job.extra_params))
+                    job.status = "done"
+                except JobCancelled as e:
+                    job.status = "cancelled"
+                    job.error = str(e)
+                    print(f">>> [INFO] Job {job.id[:8]} cancelled")
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = str(e)
+                    print(f">>> [ERROR] Background task failed: {str(e)}")
+                finally:
+                    job.finished_at = time.time()
+                    metrics.record_stage("total", job.finished_at - job.started_at)
+                    metrics.JOBS_TOTAL.inc(project=job.project_name, status=job.status)
+                    with self._lock:
+                        self._running -= 1
+                        self._hand_over_browser(job.browser_key)
+                    self._status_changed(job)
+
+    # -- process run mode --------------------------------------------------
 
-        # Double check port before passing to Selenium
-        host, port = data.remote_debugging_address.split(':')
-        if not check_port(host, int(port)):
-            print(f">>> [ERROR] Connection lost to port {port}")
+    def _get_process(self):
+        """The child process owned by the calling worker thread, spawned on demand"""
+        name = threading.current_thread().name
+        entry = self._processes.get(name)
+        if entry and entry[0].is_alive():
+            return entry
+        import job_worker
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=job_worker.worker_main, args=(child_conn,), name=f"{name}-proc", daemon=True)
+        process.start()
+        child_conn.close()
+        self._processes[name] = (process, parent_conn)
+        logger.info(f"Spawned worker process {process.pid} for {name}")
+        return process, parent_conn
+
+    def _kill_process(self, name: str):
+        process, conn = self._processes.pop(name, (None, None))
+        if not process:
             return
+        try:
+            conn.close()
+        except OSError:
+            pass
+        import job_worker
+        # Not just the child: chromedriver/gpmdriver it spawned would be orphaned
+        job_worker.kill_process_tree(process.pid)
+        process.kill()
+        process.join(timeout=5)
 
-        # Load project module
-        spec = importlib.util.spec_from_file_location(project_name, project_path)
-        project_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(project_module)
-
-        if hasattr(project_module, 'run'):
-            print(f">>> [DEBUG] Executing {project_name} on {data.remote_debugging_address}")
-            profile_data = {
-                "profile_id": data.profile_id,
-                "profile_name": data.profile_name,
-                "remote_debugging_address": data.remote_debugging_address,
-                "browser_location": "",
-                "driver_path": data.driver_path
-            }
-            # Merge extra parameters
-            if extra_params:
-                profile_data.update(extra_params)
-                
-            project_module.run(profile_data)
-        else:
-            print(f">>> [ERROR] No run() function in {project_name}")
+    def _run_in_process(self, job: Job):
+        """Run the job in this worker's child process, enforcing timeout and cancellation"""
+        process, conn = self._get_process()
+        request_fields = {
+            "remote_debugging_address": job.data.remote_debugging_address,
+            "profile_name": job.data.profile_name,
+            "profile_id": job.data.profile_id,
+            "driver_path": job.data.driver_path,
+        }
+        conn.send((job.id, job.project_name, request_fields, job.extra_params))
+        deadline = time.monotonic() + job.timeout
+        name = threading.current_thread().name
+
+        while True:
+            try:
+                ready = conn.poll(0.25)
+                if ready:
+                    message = conn.recv()
+                    if message[0] == "event":
+                        events.bus.publish(message[1])
+                        continue
+                    status, error, stages, result = message
+                    break
+            except (EOFError, OSError):
+                self._kill_process(name)
+                raise RuntimeError("Worker process died")
+            if job.cancel_requested:
+                self._kill_process(name)
+                raise JobCancelled("Cancelled while running, worker process recycled")
+            if time.monotonic() > deadline:
+                self._kill_process(name)
+                raise RuntimeError(f"Timed out after {job.timeout:.0f}s, worker process recycled")
+            if not process.is_alive():
+                self._kill_process(name)
+                raise RuntimeError(f"Worker process exited with code {process.exitcode}")
+
+        # Re-record the child's timings in this process' metrics (already streamed as events)
+        for stage, seconds in stages.items():
+            if stage.startswith("step:"):
+                metrics.record_step(stage[5:], seconds, notify=False)
+            else:
+                metrics.record_stage(stage, seconds, notify=False)
+        if status != "done":
+            raise RuntimeError(error)
+        return result
+
+
+job_store = JobStore(JOB_DB_PATH, retention_days=JOB_RETENTION_DAYS)
+scheduler = JobScheduler(store=job_store)
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "gpm_queue_depth", "Jobs waiting in the queue", lambda: scheduler.stats()["queued"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "gpm_active_jobs", "Jobs currently running", lambda: scheduler.stats()["running"]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "gpm_open_profiles", "Profiles currently opened by the server", lambda: profile_manager.open_count()))
+metrics.REGISTRY.register(metrics.Gauge(
+    "gpm_leased_drivers", "WebDriver sessions currently leased to jobs", lambda: driver_pool.stats()["leased"]))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_store.start()
+    scheduler.start()
+    driver_pool.start()
+    reaper = asyncio.create_task(profile_manager.run())
+    yield
+    reaper.cancel()
+    scheduler.stop()
+    driver_pool.stop()
+    await profile_manager.close_idle()
+    job_store.stop()
+    await gpm_client.aclose()
+
+
+app = FastAPI(title="43GPM External Automation API", lifespan=lifespan)
+
+
+def enqueue_job(project_name: str, data: AutomationRequest, extra_params: dict = None, priority: int = 0,
+                stages: Optional[Dict[str, float]] = None, timeout: Optional[float] = None,
+                holds_profile: bool = False) -> Job:
+    """Submit a job to the scheduler, translating a full queue into HTTP 429"""
+    try:
+        return scheduler.submit(project_name, data, extra_params, priority, stages, timeout, holds_profile)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+class ProfileStartError(Exception):
+    """Raised when GPM cannot start a profile or report its debug port"""
+
+
+async def resolve_profile_address(profile_id: str):
+    """
+    Return (remote_debugging_address, driver_path, owned), starting the profile through GPM if needed.
+
+    owned is None when the browser was found running without a GPM start call
+    (the profile manager keeps what it knew). GPM's start call also answers for
+    a browser that is already open (e.g. opened by hand), so after a start owned
+    is True only when the browser process is known to be newer than the call.
+    """
+    known_address, known_driver = profile_cache.peek(profile_id), profile_cache.driver_path(profile_id)
+    cached = await asyncio.to_thread(profile_cache.get, profile_id)
+    if cached:
+        print(f">>> [DEBUG] Reusing cached port for {profile_id}: {cached[0]}")
+        return cached[0], cached[1], None
+
+    # An expired cache entry whose port still answers: the browser is up, no need to start it
+    if known_address and await probe_port(known_address):
+        print(f">>> [DEBUG] Profile {profile_id} already running on {known_address}")
+        profile_cache.put(profile_id, known_address, known_driver)
+        return known_address, known_driver, None
+
+    print(f">>> [DEBUG] Auto-detecting port for Profile ID: {profile_id}")
+    requested_at = time.time()
+    result = await gpm_client.start_profile(profile_id)
+    if not (result.get("success") and result.get("data")):
+        raise ProfileStartError(result.get("message", "Unknown error"))
+
+    debug_address = result["data"].get("remote_debugging_address")
+    driver_path = result["data"].get("driver_path", "")
+    print(f">>> [DEBUG] Found running port: {debug_address}")
+    print(f">>> [DEBUG] Driver Path: {driver_path}")
+    profile_cache.put(profile_id, debug_address, driver_path)
+    # Ours only if the browser process is newer than the start call; unknown (no psutil,
+    # access denied) counts as not ours, so a hand-opened browser is never closed by mistake
+    started_at = await asyncio.to_thread(listener_started_at, debug_address)
+    owned = started_at is not None and started_at >= requested_at - 1
+    if not owned:
+        print(f">>> [DEBUG] Profile {profile_id} may have been opened elsewhere, leaving it open")
+    return debug_address, driver_path, owned
+
+
+async def close_gpm_profile(profile_id: str, address: Optional[str]) -> Dict[str, Any]:
+    """Close a profile through GPM after dropping everything we cached about it"""
+    if address:
+        await asyncio.to_thread(driver_pool.invalidate, address)
+    profile_cache.invalidate(profile_id)
+    print(f">>> [DEBUG] Closing profile {profile_id}")
+    return await gpm_client.close_profile(profile_id)
+
+
+profile_manager = ProfileLifecycleManager(
+    resolve_profile_address, close_gpm_profile,
+    idle_timeout=PROFILE_IDLE_TIMEOUT, max_open=MAX_OPEN_PROFILES, slot_timeout=PROFILE_SLOT_TIMEOUT
+)
+
+
+async def port_is_open(address: str, timeout: float = PORT_READY_TIMEOUT) -> bool:
+    """Wait (with backoff, up to timeout) for the debug port and DevTools to answer"""
+    return await wait_port_ready(address, timeout=timeout, check_devtools=True)
+
+
+@dataclass
+class Batch:
+    """One project run across many profiles; results are keyed by profile_id"""
+    project_name: str
+    profile_ids: List[str]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+    finished_starting_at: Optional[float] = None
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for profile_id in self.profile_ids:
+            self.results[profile_id] = {"stage": "pending", "job_id": None, "address": None, "error": None}
+
+    def pruned_job_ids(self) -> List[str]:
+        """Jobs of this batch that already left the scheduler's in-memory history"""
+        return [r["job_id"] for r in self.results.values() if r["job_id"] and not scheduler.get_job(r["job_id"])]
+
+    def to_dict(self, stored: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """stored: job_store records of pruned_job_ids(), so finished jobs keep their final status"""
+        results = {}
+        summary = {}
+        stored = stored or {}
+        for profile_id, result in self.results.items():
+            result = dict(result)
+            job = scheduler.get_job(result["job_id"]) if result["job_id"] else None
+            record = stored.get(result["job_id"]) if result["job_id"] and not job else None
+            if job:
+                result["status"] = job.status
+                result["error"] = result["error"] or job.error
+            elif record:
+                result["status"] = record["status"]
+                result["error"] = result["error"] or record.get("error")
+            else:
+                result["status"] = "failed" if result["stage"] == "error" else result["stage"]
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+            results[profile_id] = result
+        return {
+            "batch_id": self.id,
+            "project": self.project_name,
+            "total": len(self.profile_ids),
+            "created_at": self.created_at,
+            "finished_starting_at": self.finished_starting_at,
+            "summary": summary,
+            "results": results,
+        }
+
+
+batches = OrderedDict()  # batch_id -> Batch
+batch_tasks = set()      # Keeps running batch coroutines referenced
+
+
+async def refresh_profile_index():
+    """Sync the index when stale; on failure fall back to cached rows, or raise if it never synced"""
+    try:
+        await asyncio.to_thread(profile_index.ensure_fresh, PROFILE_INDEX_MAX_AGE)
     except Exception as e:
-        print(f">>> [ERROR] Background task failed: {str(e)}")
+        if not (await asyncio.to_thread(profile_index.stats))["last_sync"]:
+            raise  # Nothing cached: an empty result would look like "no profiles"
+        logger.warning(f"Profile index sync failed, using cached data: {e}")
+
+
+async def collect_group_profile_ids(group_id: Optional[str], **filters) -> List[str]:
+    """Profile IDs in a GPM group (all groups if None) matching filters, from the local index"""
+    await refresh_profile_index()
+    profiles = await asyncio.to_thread(profile_index.query, group_id=group_id, **filters)
+    return [p["id"] for p in profiles]
+
+
+async def run_batch(batch: Batch, params: Dict[str, Any], priority: int, concurrency: int,
+                    timeout: Optional[float] = None):
+    """
+    Start profiles with bounded concurrency and queue each one's job as soon as
+    its port answers, so script runs overlap with the remaining GPM starts.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def start_and_queue(profile_id: str):
+        result = batch.results[profile_id]
+        stages = {}
+        leased = False
+        try:
+            async with semaphore:
+                result["stage"] = "starting"
+                with metrics.job_context(batch.project_name, stages):
+                    with metrics.span("gpm_start"):
+                        debug_address, driver_path = await profile_manager.acquire(profile_id)
+                    leased = True
+                    result["address"] = debug_address
+                    with metrics.span("port_check"):
+                        port_open = await port_is_open(debug_address)
+                if not port_open:
+                    profile_cache.invalidate(profile_id)
+                    raise ProfileStartError(f"Port {debug_address} is not responding")
+
+            data = AutomationRequest(
+                remote_debugging_address=debug_address,
+                profile_id=profile_id,
+                driver_path=driver_path
+            )
+            job = scheduler.submit(batch.project_name, data, params, priority, stages, timeout, holds_profile=True)
+            result["job_id"] = job.id
+            result["stage"] = "queued"
+        except Exception as e:
+            if leased:
+                profile_manager.release(profile_id)
+            result["stage"] = "error"
+            result["error"] = str(e)
+            print(f">>> [ERROR] Batch {batch.id[:8]} profile {profile_id}: {str(e)}")
+
+    await asyncio.gather(*(start_and_queue(pid) for pid in batch.profile_ids))
+    batch.finished_starting_at = time.time()
+
 
 @app.get("/")
 async def root():
@@ -80,18 +874,24 @@ async def root():
         "status": "online",
         "usage": {
             "auto_port": "GET /execute/twitter?profile_id=ID_CUA_BAN",
-            "manual_port": "GET /execute/twitter?port=9222"
-        }
+            "manual_port": "GET /execute/twitter?port=9222",
+            "job_status": "GET /jobs/{job_id}",
+            "batch": "POST /execute/twitter/batch {\"profile_ids\": [...]} or {\"group_id\": ...}"
+        },
+        "scheduler": scheduler.stats(),
+        "events": events.bus.stats(),
+        "run_mode": scheduler.run_mode
     }
 
 @app.get("/execute/{project_name}")
 async def execute_get(
     project_name: str, 
-    background_tasks: BackgroundTasks,
     request: Request,
     profile_id: str = Query(None, description="Profile ID (Auto detect port)"),
     port: str = Query(None, description="Manual port"),
-    host: str = "127.0.0.1"
+    host: str = "127.0.0.1",
+    priority: int = Query(0, description="Lower values run first"),
+    timeout: float = Query(None, description="Job wall-clock limit in seconds (process run mode)")
 ):
     """
     GET Method: Supports both manual port and auto detection via profile_id
@@ -99,23 +899,26 @@ async def execute_get(
     # Capture all query parameters
     extra_params = dict(request.query_params)
     # Remove standard params from extra_params
-    for key in ["profile_id", "port", "host"]:
+    for key in ["profile_id", "port", "host", "priority", "timeout"]:
         extra_params.pop(key, None)
+
+    # Reject early so we don't launch a browser for a job we cannot queue
+    if scheduler.is_full():
+        raise HTTPException(status_code=429, detail="Job queue is full, retry later")
+
     debug_address = None
     driver_path = ""
+    stages = {}
     
     # Priority 1: Use Profile ID to auto-detect port
     if profile_id:
-        print(f">>> [DEBUG] Auto-detecting port for Profile ID: {profile_id}")
-        result = gpm_client.start_profile(profile_id)
-        if result.get("success") and result.get("data"):
-            debug_address = result["data"].get("remote_debugging_address")
-            driver_path = result["data"].get("driver_path", "")
-            print(f">>> [DEBUG] Found running port: {debug_address}")
-            print(f">>> [DEBUG] Driver Path: {driver_path}")
-        else:
-            error_msg = result.get("message", "Unknown error")
-            raise HTTPException(status_code=400, detail=f"Cannot find port for profile: {error_msg}")
+        try:
+            with metrics.job_context(project_name, stages), metrics.span("gpm_start"):
+                debug_address, driver_path = await profile_manager.acquire(profile_id)
+        except ProfileStartError as e:
+            raise HTTPException(status_code=400, detail=f"Cannot find port for profile: {str(e)}")
+        except ProfileCapacityError as e:
+            raise HTTPException(status_code=503, detail=str(e))
     
     # Priority 2: Use manual port
     elif port:
@@ -125,24 +928,242 @@ async def execute_get(
     else:
         raise HTTPException(status_code=400, detail="Missing parameter: 'profile_id' or 'port' is required")
 
-    # Final check before queueing
-    h, p = debug_address.split(':')
-    if not check_port(h, int(p)):
-        raise HTTPException(status_code=502, detail=f"Port {p} is not responding. Is the browser open?")
+    try:
+        # Final check before queueing
+        with metrics.job_context(project_name, stages), metrics.span("port_check"):
+            # A manual port is a browser that should already be open: fail fast instead of waiting for a start
+            port_open = await port_is_open(debug_address, PORT_READY_TIMEOUT if profile_id else MANUAL_PORT_TIMEOUT)
+        if not port_open:
+            if profile_id:
+                profile_cache.invalidate(profile_id)
+            _, p = split_address(debug_address)
+            raise HTTPException(status_code=502, detail=f"Port {p} is not responding. Is the browser open?")
+
+        data = AutomationRequest(
+            remote_debugging_address=debug_address,
+            profile_id=profile_id if profile_id else "external_id",
+            driver_path=driver_path
+        )
 
-    data = AutomationRequest(
-        remote_debugging_address=debug_address,
-        profile_id=profile_id if profile_id else "external_id",
-        driver_path=driver_path
-    )
-    
-    background_tasks.add_task(run_automation_task, project_name, data, extra_params)
-    return {"status": "queued", "project": project_name, "address": debug_address, "extra_params": extra_params}
+        job = enqueue_job(project_name, data, extra_params, priority, stages, timeout, holds_profile=bool(profile_id))
+    except HTTPException:
+        if profile_id:
+            profile_manager.release(profile_id)
+        raise
+    return {"status": "queued", "job_id": job.id, "project": project_name, "address": debug_address, "extra_params": extra_params}
 
 @app.post("/execute/{project_name}")
-async def execute_post(project_name: str, data: AutomationRequest, background_tasks: BackgroundTasks):
-    background_tasks.add_task(run_automation_task, project_name, data)
-    return {"status": "queued", "project": project_name}
+async def execute_post(
+    project_name: str,
+    data: AutomationRequest,
+    priority: int = Query(0, description="Lower values run first"),
+    timeout: float = Query(None, description="Job wall-clock limit in seconds (process run mode)")
+):
+    job = enqueue_job(project_name, data, priority=priority, timeout=timeout)
+    return {"status": "queued", "job_id": job.id, "project": project_name}
+
+@app.post("/execute/{project_name}/batch")
+async def execute_batch(project_name: str, body: BatchRequest):
+    """Run one project across many profiles (explicit IDs and/or a GPM group)"""
+    profile_ids = list(body.profile_ids)
+    filters = {k: v for k, v in (("proxy", body.proxy), ("note", body.note),
+                                 ("browser_version", body.browser_version)) if v is not None}
+    if body.group_id or filters:
+        try:
+            profile_ids.extend(await collect_group_profile_ids(body.group_id, **filters))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Cannot list profiles (group {body.group_id}): {str(e)}")
+    profile_ids = list(dict.fromkeys(profile_ids))  # De-duplicate, keep order
+    if not profile_ids:
+        raise HTTPException(status_code=400, detail="No profiles to run: pass 'profile_ids' or a non-empty 'group_id'")
+
+    free_slots = scheduler.max_queue_size - scheduler.stats()["queued"]
+    if len(profile_ids) > free_slots:
+        raise HTTPException(status_code=429, detail=f"Batch of {len(profile_ids)} exceeds free queue slots ({free_slots})")
+
+    batch = Batch(project_name=project_name, profile_ids=profile_ids)
+    batches[batch.id] = batch
+    while len(batches) > BATCH_HISTORY_LIMIT:
+        batches.popitem(last=False)
+
+    task = asyncio.create_task(run_batch(batch, body.params, body.priority, body.concurrency, body.timeout))
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+    return {"status": "accepted", "batch_id": batch.id, "project": project_name, "total": len(profile_ids)}
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    batch = batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    pruned = batch.pruned_job_ids()
+    stored = {}
+    if pruned:
+        await asyncio.to_thread(job_store.flush)
+        stored = await asyncio.to_thread(job_store.get_many, pruned)
+    return batch.to_dict(stored)
+
+@app.post("/profiles/{profile_id}/close")
+async def close_profile(profile_id: str):
+    entry = profile_manager.forget(profile_id)
+    address = entry.address if entry else profile_cache.peek(profile_id)
+    result = await close_gpm_profile(profile_id, address)
+    if not result.get("success"):
+        raise HTTPException(status_code=502, detail=f"Cannot close profile: {result.get('message')}")
+    return {"status": "closed", "profile_id": profile_id}
+
+@app.get("/debug/profiles")
+async def debug_profiles():
+    return profile_manager.stats()
+
+@app.get("/debug/locators")
+async def debug_locators():
+    """Winning fallback locators per wait name (thread mode: jobs run in this process)"""
+    return element_wait.stats.snapshot()
+
+@app.get("/debug/profile-cache")
+async def debug_profile_cache():
+    return profile_cache.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/drivers")
+async def debug_drivers():
+    return driver_pool.stats()
+
+@app.get("/projects")
+async def list_projects():
+    return project_registry.list()
+
+@app.post("/projects/{project_name}/reload")
+async def reload_project(project_name: str):
+    try:
+        project_registry.reload(project_name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {str(e)}")
+    return {"status": "reloaded", "project": project_name}
+
+@app.get("/profiles")
+async def list_profiles(
+    group_id: str = Query(None),
+    proxy: str = Query(None, description="Substring of raw_proxy (empty = no proxy)"),
+    note: str = Query(None, description="Substring of the note"),
+    browser_version: str = Query(None),
+    name: str = Query(None, description="Substring of the profile name"),
+    limit: int = Query(100, ge=1, le=5000),
+    offset: int = Query(0, ge=0)
+):
+    """Filtered profile list from the local index (synced incrementally when stale)"""
+    try:
+        await refresh_profile_index()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Profile index never synced and GPM is unreachable: {str(e)}")
+    profiles = await asyncio.to_thread(
+        profile_index.query, group_id=group_id, proxy=proxy, note=note,
+        browser_version=browser_version, name=name, limit=limit, offset=offset
+    )
+    return {"count": len(profiles), "profiles": profiles, "index": profile_index.stats()}
+
+@app.post("/profiles/sync")
+async def sync_profiles(full: Optional[bool] = Query(None, description="true: full re-scan (edits, deletions); default: incremental unless a full one is due")):
+    try:
+        return await asyncio.to_thread(profile_index.sync, full)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Profile sync failed: {str(e)}")
+
+@app.post("/profiles/bulk-update")
+async def bulk_update_profiles(body: BulkUpdateRequest):
+    """Update many GPM profiles at once; unchanged fields/profiles are skipped using the local index"""
+    return await gpm_client.bulk_update_profiles(
+        body.updates, concurrency=body.concurrency, skip_unchanged=body.skip_unchanged, known=profile_index
+    )
+
+@app.get("/jobs")
+async def list_jobs(
+    status: str = Query(None, description="queued / running / done / failed / cancelled"),
+    project: str = Query(None),
+    profile_id: str = Query(None),
+    since: float = Query(None, description="Only jobs created after this unix timestamp"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Job history from the persistent store, newest first (e.g. ?status=failed to re-run failures)"""
+    await asyncio.to_thread(job_store.flush)
+    jobs = await asyncio.to_thread(job_store.list, status, project, profile_id, since, limit, offset)
+    return {"count": len(jobs), "jobs": jobs}
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_events(request: Request, sub: events.Subscription, initial: Optional[Dict[str, Any]] = None):
+    """Relay a bus subscription as SSE until the client leaves (or the followed job finishes)"""
+    try:
+        if initial:
+            yield format_sse(initial)
+            if sub.job_id and initial.get("status") in events.TERMINAL_STATUSES:
+                return
+        reported_drops = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if sub.dropped != reported_drops:
+                yield format_sse({"type": "dropped", "count": sub.dropped - reported_drops})
+                reported_drops = sub.dropped
+            yield format_sse(event)
+            if sub.job_id and event["type"] == "job" and event.get("status") in events.TERMINAL_STATUSES:
+                return
+    finally:
+        events.bus.unsubscribe(sub)
+
+@app.get("/events")
+async def all_events(request: Request):
+    """Live stream of every job's status changes, stage timings and script progress"""
+    sub = events.bus.subscribe()
+    return StreamingResponse(stream_events(request, sub), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Live stream for one job; starts with its current state and ends when it finishes"""
+    sub = events.bus.subscribe(job_id)  # Subscribe before the snapshot so no transition is missed
+    job = scheduler.get_job(job_id)
+    snapshot = job.to_dict() if job else await asyncio.to_thread(job_store.get, job_id)
+    if not snapshot:
+        events.bus.unsubscribe(sub)
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    initial = {"type": "job", "ts": time.time(), **snapshot}
+    return StreamingResponse(stream_events(request, sub, initial), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = scheduler.get_job(job_id)
+    if job:
+        return job.to_dict()
+    stored = await asyncio.to_thread(job_store.get, job_id)
+    if not stored:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return stored
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    try:
+        job = scheduler.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "cancelling" if job.status == "running" else job.status, "job_id": job_id}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio CDP driver: one event loop driving many browsers
+
+cdp_client keeps a reader thread per browser, which is fine for a few
+profiles but wastes a thread (and its stack) per browser blocked in
+ws.recv(). Here every browser-level websocket is read by a task on one
+event loop, so a single process can hold sessions to 100+ profiles and run
+the same script coroutine against all of them:
+
+    async def script(browser, profile):
+        page = await browser.attach_page(url_contains="popup.html")
+        await page.wait_for_element(['text=Import wallet'], timeout=10, click=True)
+        return await page.evaluate("location.href")
+
+    results = asyncio.run(run_many(profiles, script, concurrency=50))
+    # [{"address": ..., "profile_id": ..., "ok": True, "result": ..., "seconds": ...}, ...]
+
+Each profile runs under the concurrency semaphore with its own deadline;
+an exception or timeout in one profile is recorded in its result and never
+affects the others. Command/event semantics match cdp_client (flattened
+sessions, futures by message id, events fanned out to subscribers).
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from cdp_client import CDPError
+from element_wait import WAIT_FOR_ELEMENT_JS, normalize_locators
+
+try:
+    import httpx
+    import websockets
+except ImportError:  # Only needed by this module
+    httpx = websockets = None
+
+logger = logging.getLogger("AsyncCDP")
+
+
+async def browser_ws_url(debug_address: str, timeout: float = 5) -> str:
+    """Browser-level websocket URL from /json/version"""
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        response = await client.get(f"http://{debug_address}/json/version")
+        return response.json()["webSocketDebuggerUrl"]
+
+
+class AsyncCDPConnection:
+    """A browser websocket read by one task on the running event loop"""
+
+    def __init__(self, ws, default_timeout: float = 30):
+        self._ws = ws
+        self.default_timeout = default_timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._listeners: Dict[tuple, List[Callable[[Dict[str, Any]], None]]] = {}
+        self.closed = False
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, debug_address: str, connect_timeout: float = 10,
+                      default_timeout: float = 30) -> "AsyncCDPConnection":
+        if websockets is None or httpx is None:
+            raise ImportError("async_cdp requires websockets and httpx: pip install websockets httpx")
+        ws_url = await browser_ws_url(debug_address, timeout=connect_timeout)
+        # No Origin header (Chrome 111+ rejects unknown origins); CDP replies can be large
+        ws = await websockets.connect(ws_url, max_size=None, open_timeout=connect_timeout, ping_interval=None)
+        return cls(ws, default_timeout)
+
+    async def call(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send a command and wait for its result"""
+        if self.closed:
+            raise CDPError("CDP connection is closed")
+        msg_id = next(self._ids)
+        message = {"id": msg_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.default_timeout)
+        except asyncio.TimeoutError:
+            raise CDPError(f"{method} timed out")
+        except websockets.ConnectionClosed as e:
+            raise CDPError(f"{method} send failed: {e}")
+        finally:
+            self._pending.pop(msg_id, None)
+
+    def on(self, method: str, callback: Callable[[Dict[str, Any]], None],
+           session_id: Optional[str] = None) -> Callable[[], None]:
+        """Subscribe to an event (session_id=None: every session); returns the unsubscribe function"""
+        key = (method, session_id)
+        self._listeners.setdefault(key, []).append(callback)
+
+        def unsubscribe():
+            callbacks = self._listeners.get(key, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+        return unsubscribe
+
+    def expect_event(self, method: str, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                     session_id: Optional[str] = None) -> asyncio.Future:
+        """Future resolving with the first matching event's params (register before triggering it)"""
+        future = asyncio.get_running_loop().create_future()
+
+        def handler(params):
+            if not future.done() and (predicate is None or predicate(params)):
+                future.set_result(params)
+
+        unsubscribe = self.on(method, handler, session_id)
+        future.add_done_callback(lambda _: unsubscribe())
+        return future
+
+    async def wait_for_event(self, method: str, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                             session_id: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        future = self.expect_event(method, predicate, session_id)
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.default_timeout)
+        except asyncio.TimeoutError:
+            raise CDPError(f"Timed out waiting for {method}")
+
+    async def attach(self, target_id: str) -> "AsyncCDPSession":
+        result = await self.call("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+        return AsyncCDPSession(self, result["sessionId"], target_id)
+
+    async def get_targets(self, type_: Optional[str] = None) -> List[Dict[str, Any]]:
+        infos = (await self.call("Target.getTargets"))["targetInfos"]
+        return [t for t in infos if type_ is None or t.get("type") == type_]
+
+    async def attach_page(self, url_contains: Optional[str] = None,
+                          exclude: Optional[List[str]] = None) -> Optional["AsyncCDPSession"]:
+        """Attach to the first page target whose URL matches, or None"""
+        for target in await self.get_targets():
+            url = target.get("url", "")
+            if target.get("type") not in ("page", "other"):
+                continue
+            if url_contains and url_contains not in url:
+                continue
+            if exclude and any(x in url for x in exclude):
+                continue
+            return await self.attach(target["targetId"])
+        return None
+
+    async def new_page(self, url: str = "about:blank") -> "AsyncCDPSession":
+        target_id = (await self.call("Target.createTarget", {"url": url}))["targetId"]
+        return await self.attach(target_id)
+
+    async def close(self):
+        self.closed = True
+        self._reader.cancel()
+        try:
+            await self._ws.close()
+        except Exception:
+            pass
+        self._fail_pending("CDP connection closed")
+
+    async def _read_loop(self):
+        try:
+            async for raw in self._ws:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                        else:
+                            future.set_result(message.get("result", {}))
+                elif "method" in message:
+                    self._dispatch(message["method"], message.get("params", {}), message.get("sessionId"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not self.closed:
+                logger.warning(f"CDP connection lost: {e}")
+        self.closed = True
+        self._fail_pending("CDP connection closed")
+
+    def _fail_pending(self, reason: str):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(CDPError(reason))
+
+    def _dispatch(self, method: str, params: Dict[str, Any], session_id: Optional[str]):
+        callbacks = list(self._listeners.get((method, session_id), []))
+        if session_id is not None:
+            callbacks += self._listeners.get((method, None), [])
+        for callback in callbacks:
+            try:
+                callback(params)
+            except Exception as e:
+                logger.error(f"CDP listener for {method} failed: {e}")
+
+
+class AsyncCDPSession:
+    """A target attached over a shared AsyncCDPConnection"""
+
+    def __init__(self, connection: AsyncCDPConnection, session_id: str, target_id: str):
+        self.connection = connection
+        self.session_id = session_id
+        self.target_id = target_id
+
+    async def call(self, method: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.connection.call(method, params, self.session_id, timeout)
+
+    def on(self, method: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        return self.connection.on(method, callback, self.session_id)
+
+    def expect_event(self, method: str, predicate=None) -> asyncio.Future:
+        return self.connection.expect_event(method, predicate, self.session_id)
+
+    async def wait_for_event(self, method: str, predicate=None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.connection.wait_for_event(method, predicate, self.session_id, timeout)
+
+    async def evaluate(self, expression: str, await_promise: bool = True, timeout: Optional[float] = None) -> Any:
+        """Runtime.evaluate returning the value; raises CDPError on a JS exception"""
+        result = await self.call("Runtime.evaluate", {
+            "expression": expression,
+            "userGesture": True,
+            "awaitPromise": await_promise,
+            "returnByValue": True
+        }, timeout=timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            text = details.get("exception", {}).get("description") or details.get("text")
+            raise CDPError(f"JS Error: {text}")
+        return result.get("result", {}).get("value")
+
+    async def wait_for_element(self, locators, timeout: float = 15, click: bool = False) -> Optional[Dict[str, Any]]:
+        """In-page wait (see element_wait): {"index", "clicked"} of the first visible match, None on timeout"""
+        expression = (
+            f"({WAIT_FOR_ELEMENT_JS})({json.dumps(normalize_locators(locators))}, {int(timeout * 1000)}, {json.dumps(click)})"
+            ".then(r => r && {index: r.index, clicked: !!r.clicked})"
+        )
+        return await self.evaluate(expression, timeout=timeout + 5)
+
+    async def activate(self):
+        await self.connection.call("Target.activateTarget", {"targetId": self.target_id})
+
+    async def detach(self):
+        try:
+            await self.connection.call("Target.detachFromTarget", {"sessionId": self.session_id})
+        except CDPError:
+            pass
+
+
+Script = Callable[[AsyncCDPConnection, Dict[str, Any]], Awaitable[Any]]
+
+
+async def run_profile(profile: Union[str, Dict[str, Any]], script: Script, timeout: float = 300) -> Dict[str, Any]:
+    """Connect to one browser, run script(browser, profile_data) and report; never raises"""
+    profile_data = {"remote_debugging_address": profile} if isinstance(profile, str) else profile
+    address = profile_data["remote_debugging_address"]
+    report = {"address": address, "profile_id": profile_data.get("profile_id"), "ok": False}
+    started = time.monotonic()
+    browser = None
+    try:
+        async def connect_and_run():
+            nonlocal browser
+            browser = await AsyncCDPConnection.connect(address)
+            return await script(browser, profile_data)
+
+        report["result"] = await asyncio.wait_for(connect_and_run(), timeout)
+        report["ok"] = True
+    except asyncio.TimeoutError:
+        report["error"] = f"Timed out after {timeout}s"
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if browser is not None:
+            await browser.close()
+    report["seconds"] = round(time.monotonic() - started, 3)
+    if not report["ok"]:
+        logger.warning(f"[{address}] {report['error']}")
+    return report
+
+
+async def run_many(
+    profiles: Iterable[Union[str, Dict[str, Any]]],
+    script: Script,
+    concurrency: int = 50,
+    timeout: float = 300
+) -> List[Dict[str, Any]]:
+    """
+    Run script against every profile (debug address or profile_data dict) on this event loop.
+
+    At most `concurrency` browsers are driven at once; each gets `timeout`
+    seconds. Results come back in input order, one report per profile.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def guarded(profile):
+        async with semaphore:
+            return await run_profile(profile, script, timeout)
+
+    return await asyncio.gather(*(guarded(p) for p in profiles))
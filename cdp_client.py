@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Chrome DevTools Protocol (CDP) connection for project scripts
+
+One browser-level websocket per debug address is shared by every target:
+pages are attached with Target.attachToTarget(flatten=True) and addressed by
+sessionId. A single reader thread dispatches responses to futures by
+monotonic message ID and forwards events to subscribers, so several commands
+can be in flight at once and no event is lost while waiting for a reply.
+
+Usage:
+    browser = get_browser("127.0.0.1:53378")
+    page = browser.attach_page(url_contains="popup.html")
+    page.evaluate("document.title")
+    page.wait_for_event("Page.loadEventFired", timeout=10)
+"""
+import itertools
+import json
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+import websocket
+
+logger = logging.getLogger("CDP")
+
+
+class CDPError(Exception):
+    """Raised when the browser answers a command with an error"""
+
+
+def list_targets(debug_address: str, timeout: float = 5) -> List[Dict[str, Any]]:
+    """Targets reported by http://{debug_address}/json"""
+    return requests.get(f"http://{debug_address}/json", timeout=timeout).json()
+
+
+def browser_ws_url(debug_address: str, timeout: float = 5) -> str:
+    """Browser-level websocket URL from /json/version"""
+    info = requests.get(f"http://{debug_address}/json/version", timeout=timeout).json()
+    return info["webSocketDebuggerUrl"]
+
+
+class CDPConnection:
+    """A websocket to the browser with a background reader thread"""
+
+    def __init__(self, ws_url: str, connect_timeout: float = 10, default_timeout: float = 30):
+        self.ws_url = ws_url
+        self.default_timeout = default_timeout
+        # suppress_origin: Chrome 111+ rejects websocket handshakes carrying an unknown Origin
+        self._ws = websocket.create_connection(ws_url, timeout=connect_timeout, suppress_origin=True)
+        self._ws.settimeout(None)
+        self._ids = itertools.count(1)
+        self._pending = {}      # message id -> Future
+        self._listeners = {}    # (method, session_id) -> [callback]
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    # ------------------------------------------------------------------ commands
+
+    def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None) -> Future:
+        """Send a command without waiting; the returned Future resolves to its result"""
+        if self.closed:
+            raise CDPError("CDP connection is closed")
+        msg_id = next(self._ids)
+        message = {"id": msg_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+
+        future = Future()
+        with self._lock:
+            self._pending[msg_id] = future
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps(message))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(msg_id, None)
+            future.set_exception(CDPError(f"{method} send failed: {e}"))
+        return future
+
+    def call(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send a command and block until its result arrives"""
+        future = self.send(method, params, session_id)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.default_timeout)
+        except FutureTimeoutError:
+            raise CDPError(f"{method} timed out")
+
+    # -------------------------------------------------------------------- events
+
+    def on(self, method: str, callback: Callable[[Dict[str, Any]], None],
+           session_id: Optional[str] = None) -> Callable[[], None]:
+        """
+        Subscribe to an event. session_id=None receives the event from every session.
+        Returns a function that removes the subscription.
+        """
+        key = (method, session_id)
+        with self._lock:
+            self._listeners.setdefault(key, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._listeners.get(key, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+
+        return unsubscribe
+
+    def wait_for_event(self, method: str, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                       session_id: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Block until `method` fires (and predicate(params) holds); returns the event params"""
+        future = self.expect_event(method, predicate, session_id)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.default_timeout)
+        except FutureTimeoutError:
+            raise CDPError(f"Timed out waiting for {method}")
+        finally:
+            future.cancel()
+
+    def expect_event(self, method: str, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                     session_id: Optional[str] = None) -> Future:
+        """
+        Register interest in an event before triggering it.
+        The returned Future resolves with the first matching event's params.
+        """
+        future = Future()
+
+        def handler(params):
+            if future.done():
+                return
+            if predicate is None or predicate(params):
+                future.set_result(params)
+
+        unsubscribe = self.on(method, handler, session_id)
+        future.add_done_callback(lambda _: unsubscribe())
+        return future
+
+    # ------------------------------------------------------------------- targets
+
+    def attach(self, target_id: str) -> "CDPSession":
+        """Attach to a target over this connection (flattened session)"""
+        result = self.call("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+        return CDPSession(self, result["sessionId"], target_id)
+
+    def get_targets(self, type_: Optional[str] = None) -> List[Dict[str, Any]]:
+        infos = self.call("Target.getTargets")["targetInfos"]
+        return [t for t in infos if type_ is None or t.get("type") == type_]
+
+    def attach_page(self, url_contains: Optional[str] = None,
+                    exclude: Optional[List[str]] = None) -> Optional["CDPSession"]:
+        """Attach to the first page target whose URL matches, or None"""
+        for target in self.get_targets():
+            url = target.get("url", "")
+            if target.get("type") not in ("page", "other"):
+                continue
+            if url_contains and url_contains not in url:
+                continue
+            if exclude and any(x in url for x in exclude):
+                continue
+            return self.attach(target["targetId"])
+        return None
+
+    def new_page(self, url: str = "about:blank") -> "CDPSession":
+        target_id = self.call("Target.createTarget", {"url": url})["targetId"]
+        return self.attach(target_id)
+
+    # ---------------------------------------------------------------- lifecycle
+
+    def close(self):
+        self.closed = True
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                raw = self._ws.recv()
+            except Exception as e:
+                if not self.closed:
+                    logger.warning(f"CDP connection lost: {e}")
+                break
+            if not raw:
+                continue
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+
+            if "id" in message:
+                with self._lock:
+                    future = self._pending.pop(message["id"], None)
+                if future and not future.done():
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", str(message["error"]))))
+                    else:
+                        future.set_result(message.get("result", {}))
+            elif "method" in message:
+                self._dispatch(message["method"], message.get("params", {}), message.get("sessionId"))
+
+        self.closed = True
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(CDPError("CDP connection closed"))
+
+    def _dispatch(self, method: str, params: Dict[str, Any], session_id: Optional[str]):
+        with self._lock:
+            callbacks = list(self._listeners.get((method, session_id), []))
+            if session_id is not None:
+                callbacks += self._listeners.get((method, None), [])
+        for callback in callbacks:
+            try:
+                callback(params)
+            except Exception as e:
+                logger.error(f"CDP listener for {method} failed: {e}")
+
+
+class CDPSession:
+    """A target (tab/extension page) attached over a shared CDPConnection"""
+
+    def __init__(self, connection: CDPConnection, session_id: str, target_id: str):
+        self.connection = connection
+        self.session_id = session_id
+        self.target_id = target_id
+
+    def send(self, method: str, params: Optional[dict] = None) -> Future:
+        return self.connection.send(method, params, self.session_id)
+
+    def call(self, method: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.connection.call(method, params, self.session_id, timeout)
+
+    def on(self, method: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        return self.connection.on(method, callback, self.session_id)
+
+    def expect_event(self, method: str, predicate=None) -> Future:
+        return self.connection.expect_event(method, predicate, self.session_id)
+
+    def wait_for_event(self, method: str, predicate=None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.connection.wait_for_event(method, predicate, self.session_id, timeout)
+
+    def evaluate(self, expression: str, await_promise: bool = True, timeout: Optional[float] = None) -> Any:
+        """Runtime.evaluate returning the value; raises CDPError on a JS exception"""
+        result = self.call("Runtime.evaluate", {
+            "expression": expression,
+            "userGesture": True,
+            "awaitPromise": await_promise,
+            "returnByValue": True
+        }, timeout=timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            text = details.get("exception", {}).get("description") or details.get("text")
+            raise CDPError(f"JS Error: {text}")
+        return result.get("result", {}).get("value")
+
+    def activate(self):
+        self.connection.call("Target.activateTarget", {"targetId": self.target_id})
+
+    def detach(self):
+        try:
+            self.connection.call("Target.detachFromTarget", {"sessionId": self.session_id})
+        except CDPError:
+            pass
+
+
+_browsers = {}  # debug_address -> CDPConnection
+_browsers_lock = threading.Lock()
+
+
+def get_browser(debug_address: str) -> CDPConnection:
+    """Shared browser-level connection for debug_address, reconnecting if it dropped"""
+    with _browsers_lock:
+        connection = _browsers.get(debug_address)
+        if connection is None or connection.closed:
+            connection = CDPConnection(browser_ws_url(debug_address))
+            _browsers[debug_address] = connection
+        return connection
+
+
+def close_browser(debug_address: str):
+    with _browsers_lock:
+        connection = _browsers.pop(debug_address, None)
+    if connection:
+        connection.close()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of Selenium sessions attached to running GPM browsers
+
+Starting chromedriver and attaching to a browser costs 1-3s per job. The pool
+keeps attached sessions per remote_debugging_address, health-checks them before
+handing them out and quits the ones left idle for too long. Quitting a session
+created with "debuggerAddress" stops chromedriver but leaves the browser open.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+logger = logging.getLogger("DriverPool")
+
+
+class PooledDriver:
+    """A WebDriver plus the bookkeeping the pool needs"""
+
+    def __init__(self, driver, address: str, driver_path: str):
+        self.driver = driver
+        self.address = address
+        self.driver_path = driver_path
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    Attached WebDriver sessions keyed by debugger address.
+
+    acquire() returns an idle healthy session or attaches a new one;
+    release() hands it back. A session is only ever leased to one job at a time.
+    """
+
+    def __init__(self, idle_timeout: float = 300, max_idle: int = 50, attach_retries: int = 3):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.attach_retries = attach_retries
+        self._idle = {}     # address -> [PooledDriver]
+        self._leased = {}   # id(driver) -> PooledDriver
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper = None
+        self.created = 0
+        self.reused = 0
+
+    def start(self):
+        self._stop.clear()
+        self._reaper = threading.Thread(target=self._reap_loop, name="driver-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for entry in entries:
+                self._quit(entry)
+
+    def acquire(self, address: str, driver_path: str = ""):
+        """Return a healthy WebDriver attached to address"""
+        while True:
+            with self._lock:
+                entries = self._idle.get(address, [])
+                entry = entries.pop() if entries else None
+            if entry is None:
+                break
+            if self._is_healthy(entry):
+                entry.uses += 1
+                entry.last_used = time.time()
+                self.reused += 1
+                with self._lock:
+                    self._leased[id(entry.driver)] = entry
+                return entry.driver
+            self._quit(entry)
+
+        entry = PooledDriver(self._attach(address, driver_path), address, driver_path)
+        entry.uses = 1
+        self.created += 1
+        with self._lock:
+            self._leased[id(entry.driver)] = entry
+        return entry.driver
+
+    def release(self, driver, discard: bool = False):
+        """Return a leased driver; discard=True quits it instead of pooling it"""
+        with self._lock:
+            entry = self._leased.pop(id(driver), None)
+            if entry and not discard and self._idle_count() < self.max_idle:
+                entry.last_used = time.time()
+                self._idle.setdefault(entry.address, []).append(entry)
+                return
+        if entry:
+            self._quit(entry)
+
+    def invalidate(self, address: str):
+        """Drop idle sessions for an address (e.g. the profile was closed)"""
+        with self._lock:
+            entries = self._idle.pop(address, [])
+        for entry in entries:
+            self._quit(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            idle = {
+                address: [
+                    {"uses": e.uses, "idle_for": round(now - e.last_used, 1), "age": round(now - e.created_at, 1)}
+                    for e in entries
+                ]
+                for address, entries in self._idle.items() if entries
+            }
+            leased = len(self._leased)
+        return {
+            "idle_timeout": self.idle_timeout,
+            "created": self.created,
+            "reused": self.reused,
+            "leased": leased,
+            "idle": idle,
+        }
+
+    def _idle_count(self) -> int:
+        return sum(len(entries) for entries in self._idle.values())
+
+    def _attach(self, address: str, driver_path: str):
+        last_error = None
+        for attempt in range(self.attach_retries):
+            try:
+                opts = Options()
+                opts.add_experimental_option("debuggerAddress", address)
+                service = Service(executable_path=driver_path) if driver_path else Service()
+                driver = webdriver.Chrome(service=service, options=opts)
+                logger.info(f"Attached new WebDriver session to {address}")
+                return driver
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Attach to {address} failed (attempt {attempt + 1}): {str(e)[:100]}")
+                time.sleep(1 + attempt)
+        raise RuntimeError(f"Cannot attach WebDriver to {address}: {last_error}")
+
+    @staticmethod
+    def _is_healthy(entry: PooledDriver) -> bool:
+        try:
+            handles = entry.driver.window_handles
+            if not handles:
+                return False
+            # The previous job may have left us on a tab that has since been closed
+            try:
+                entry.driver.current_window_handle
+            except Exception:
+                entry.driver.switch_to.window(handles[0])
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(entry: PooledDriver):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+
+    def _reap_loop(self):
+        while not self._stop.wait(min(30.0, self.idle_timeout)):
+            now = time.time()
+            expired: List[PooledDriver] = []
+            with self._lock:
+                for address in list(self._idle):
+                    keep = []
+                    for entry in self._idle[address]:
+                        (expired if now - entry.last_used > self.idle_timeout else keep).append(entry)
+                    if keep:
+                        self._idle[address] = keep
+                    else:
+                        del self._idle[address]
+            for entry in expired:
+                logger.info(f"Evicting idle WebDriver session for {entry.address}")
+                self._quit(entry)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Event-driven element waits for project scripts
+
+Instead of polling find_elements every 0.5-1s, the wait runs inside the page:
+a MutationObserver re-checks the fallback locators whenever the DOM changes
+and resolves the moment one of them matches a visible element.
+
+Locators are tried in order and may be:
+    "//button[...]" or "(//a)[1]"   -> XPath
+    "text=Import"                   -> visible element whose text contains "Import"
+    "css=.btn" or ".btn"            -> CSS selector
+    (By.XPATH, "...") tuples        -> Selenium style (By.ID, By.NAME, ... also work)
+
+Usage (Selenium):
+    el = wait_for_element(driver, ['//*[@data-testid="confirm"]', 'text=Confirm'], timeout=10)
+
+Every winning locator is counted per wait name (element_wait.stats); with
+adaptive=True the locators that keep winning are tried first.
+
+Usage (CDP, see cdp_client):
+    wait_for_element_cdp(page, ['text=confirm'], timeout=10, click=True)
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+Locator = Union[str, Sequence[str]]
+
+# In-page matcher: firstMatch(locators) -> {element, index} of the first visible match, or null
+_MATCH_JS = r"""
+    function visible(el) {
+        if (!el || !el.isConnected) return false;
+        const style = window.getComputedStyle(el);
+        if (style.visibility === 'hidden' || style.display === 'none') return false;
+        return el.getClientRects().length > 0;
+    }
+    function byText(value) {
+        const needle = value.trim().toLowerCase();
+        const matches = Array.from(document.querySelectorAll('button, a, div, span, p, label, li'))
+            .filter(e => visible(e) && e.textContent.trim().toLowerCase().includes(needle));
+        // Innermost match: a wrapper div also "contains" its button's text
+        return matches.find(e => !matches.some(o => o !== e && e.contains(o))) || null;
+    }
+    function resolve(loc) {
+        try {
+            if (loc.type === 'xpath') {
+                const snap = document.evaluate(loc.value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                for (let i = 0; i < snap.snapshotLength; i++) {
+                    if (visible(snap.snapshotItem(i))) return snap.snapshotItem(i);
+                }
+                return null;
+            }
+            if (loc.type === 'text') return byText(loc.value);
+            return Array.from(document.querySelectorAll(loc.value)).find(visible) || null;
+        } catch (e) {
+            return null;  // Invalid selector for this page: try the next one
+        }
+    }
+    function firstMatch(locators) {
+        for (let i = 0; i < locators.length; i++) {
+            const el = resolve(locators[i]);
+            if (el) return {element: el, index: i};
+        }
+        return null;
+    }
+"""
+
+# Resolves to {element, index} for the first visible match, or null on timeout
+WAIT_FOR_ELEMENT_JS = r"""
+function(locators, timeoutMs, click) {
+""" + _MATCH_JS + r"""
+    const check = () => firstMatch(locators);
+    return new Promise(done => {
+        let observer = null, timer = null, scheduled = false;
+        function finish(result) {
+            if (observer) observer.disconnect();
+            if (timer) clearTimeout(timer);
+            if (result && click) {
+                result.element.click();
+                result.clicked = true;
+            }
+            done(result);
+        }
+        const first = check();
+        if (first) return finish(first);
+        observer = new MutationObserver(() => {
+            if (scheduled) return;
+            scheduled = true;
+            // Coalesce a burst of mutations into one check
+            queueMicrotask(() => {
+                scheduled = false;
+                const hit = check();
+                if (hit) finish(hit);
+            });
+        });
+        observer.observe(document.documentElement || document, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+        timer = setTimeout(() => finish(check()), timeoutMs);
+    });
+}
+"""
+
+
+class LocatorStats:
+    """
+    Hit counts of fallback locators, per wait name.
+
+    A locator that keeps winning moves to the front of its list, so a stale
+    primary locator stops costing a full DOM scan on every check.
+    """
+
+    def __init__(self):
+        self._hits = {}  # (name, locator json) -> hits
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, locator: Dict[str, str]) -> Tuple[str, str]:
+        return name, json.dumps(locator, sort_keys=True)
+
+    def record(self, name: str, locator: Dict[str, str]):
+        key = self._key(name, locator)
+        with self._lock:
+            self._hits[key] = self._hits.get(key, 0) + 1
+
+    def order(self, name: str, locators: List[Dict[str, str]]) -> List[int]:
+        """Indexes of locators, most hits first (ties keep the given order)"""
+        with self._lock:
+            hits = [self._hits.get(self._key(name, loc), 0) for loc in locators]
+        return sorted(range(len(locators)), key=lambda i: -hits[i])
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            items = list(self._hits.items())
+        result = {}
+        for (name, locator), hits in items:
+            loc = json.loads(locator)
+            result.setdefault(name, {})[f"{loc['type']}={loc['value']}"] = hits
+        return result
+
+
+stats = LocatorStats()
+
+
+def _ordered(locators, name: str, adaptive: bool) -> Tuple[List[Dict[str, str]], List[int]]:
+    """Normalized locators (reordered by past hits if adaptive) and their original indexes"""
+    normalized = normalize_locators(locators)
+    order = stats.order(name, normalized) if adaptive else list(range(len(normalized)))
+    return [normalized[i] for i in order], order
+
+
+def normalize_locators(locators: Union[Locator, List[Locator]]) -> List[Dict[str, str]]:
+    """Turn strings / (By, value) tuples into [{"type": "css|xpath|text", "value": ...}]"""
+    if isinstance(locators, (str, tuple)):
+        locators = [locators]
+
+    normalized = []
+    for loc in locators:
+        if isinstance(loc, (tuple, list)):
+            by, value = loc
+            if by == "xpath":
+                normalized.append({"type": "xpath", "value": value})
+            elif by in ("link text", "partial link text"):
+                normalized.append({"type": "text", "value": value})
+            elif by == "id":
+                normalized.append({"type": "css", "value": f'[id="{value}"]'})
+            elif by == "name":
+                normalized.append({"type": "css", "value": f'[name="{value}"]'})
+            elif by == "class name":
+                normalized.append({"type": "css", "value": f".{value}"})
+            else:  # css selector / tag name
+                normalized.append({"type": "css", "value": value})
+        elif loc.startswith("text="):
+            normalized.append({"type": "text", "value": loc[5:]})
+        elif loc.startswith("css="):
+            normalized.append({"type": "css", "value": loc[4:]})
+        elif loc.startswith("xpath="):
+            normalized.append({"type": "xpath", "value": loc[6:]})
+        elif loc.startswith("/") or loc.startswith("(/"):
+            normalized.append({"type": "xpath", "value": loc})
+        else:
+            normalized.append({"type": "css", "value": loc})
+    return normalized
+
+
+def wait_for_element(driver, locators, timeout: float = 15, click: bool = False, name: str = "Element",
+                     with_index: bool = False, adaptive: bool = False):
+    """
+    Wait in the page (Selenium execute_async_script) for the first visible match.
+
+    With adaptive=True the locators are tried in order of past hits for this
+    name instead of the given order (use when they are plain fallbacks, not
+    priorities).
+
+    Returns:
+        The WebElement, or (WebElement, index of the winning locator) if with_index
+    Raises:
+        TimeoutException if nothing matched within timeout
+    """
+    from selenium.common.exceptions import TimeoutException
+
+    ordered, order = _ordered(locators, name, adaptive)
+    script = (
+        "const done = arguments[arguments.length - 1];"
+        f"({WAIT_FOR_ELEMENT_JS})(arguments[0], arguments[1], arguments[2])"
+        ".then(r => done(r), () => done(null));"
+    )
+    # Pooled drivers are shared by later jobs: put their script timeout back afterwards
+    previous_timeout = driver.timeouts.script
+    driver.set_script_timeout(timeout + 5)
+    try:
+        result = driver.execute_async_script(script, ordered, int(timeout * 1000), click)
+    finally:
+        driver.set_script_timeout(previous_timeout)
+    if not result:
+        raise TimeoutException(f"Không tìm thấy {name}")
+    stats.record(name, ordered[result["index"]])
+    return (result["element"], order[result["index"]]) if with_index else result["element"]
+
+
+def wait_for_element_cdp(page, locators, timeout: float = 15, click: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Same wait over CDP (Runtime.evaluate with awaitPromise) for a cdp_client.CDPSession.
+
+    Returns:
+        {"index": <winning locator index>, "clicked": bool} or None on timeout
+    """
+    expression = (
+        f"({WAIT_FOR_ELEMENT_JS})({json.dumps(normalize_locators(locators))}, {int(timeout * 1000)}, {json.dumps(click)})"
+        ".then(r => r && {index: r.index, clicked: !!r.clicked})"
+    )
+    return page.evaluate(expression, timeout=timeout + 5)
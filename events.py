@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Live job progress events
+
+Everything that happens to a job is published on one in-process bus:
+status changes from the scheduler, stage/step timings from metrics, and
+free-form progress messages from project scripts:
+
+    from events import emit
+
+    emit("Đang nhập mnemonic", step="inject_mnemonic")
+
+emit() never blocks: it hands the event to each subscriber's event loop and
+returns. Every subscriber has a bounded buffer; when a slow consumer falls
+behind, its oldest events are dropped (and counted) instead of slowing the
+jobs down. The API server streams the bus as Server-Sent Events.
+
+In process run mode the child process installs a sink (set_sink) that
+forwards events over its pipe to the server, which republishes them.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class Subscription:
+    """One consumer of the bus, optionally limited to a single job"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, job_id: Optional[str], maxsize: int):
+        self.loop = loop
+        self.job_id = job_id
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]):
+        """Runs on the subscriber's loop: enqueue, dropping the oldest event when full"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, event: Dict[str, Any]):
+        """Thread-safe, non-blocking fan-out to current subscribers"""
+        self.published += 1
+        with self._lock:
+            targets = [s for s in self._subscribers if s.job_id is None or s.job_id == event.get("job_id")]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # Subscriber's loop is gone
+                self.unsubscribe(sub)
+
+    def subscribe(self, job_id: Optional[str] = None, maxsize: Optional[int] = None) -> Subscription:
+        """Register a subscriber on the running event loop (call from async code)"""
+        sub = Subscription(asyncio.get_running_loop(), job_id, maxsize or self.buffer_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subs = list(self._subscribers)
+        return {
+            "published": self.published,
+            "subscribers": len(subs),
+            "dropped": sum(s.dropped for s in subs),
+        }
+
+
+bus = EventBus()
+_sink: Callable[[Dict[str, Any]], None] = bus.publish
+
+
+def set_sink(sink: Callable[[Dict[str, Any]], None]):
+    """Redirect published events (used by process-mode workers to forward to the server)"""
+    global _sink
+    _sink = sink
+
+
+def publish(event_type: str, job_id: Optional[str] = None, project: Optional[str] = None, **data):
+    """Publish an event; job_id/project default to the current job context"""
+    current_project, current_job = metrics.current_job()
+    event = {
+        "type": event_type,
+        "job_id": job_id or current_job,
+        "project": project or current_project,
+        "ts": time.time(),
+    }
+    event.update(data)
+    _sink(event)
+
+
+def emit(message: str, **data):
+    """Progress message from a project script (cheap when nobody listens)"""
+    publish("progress", message=message, **data)
+
+
+def _on_timing(kind: str, name: str, seconds: float):
+    publish(kind, name=name, seconds=round(seconds, 4))
+
+
+metrics.add_listener(_on_timing)
+
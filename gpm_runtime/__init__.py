@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Shared runtime for project scripts
+
+One attach path (port readiness with backoff, pooled + retried sessions,
+timed as the "attach" step), DevTools-based tab selection, load-state
+aware navigation, in-page waits, step timing, progress events, opt-in
+request blocking and declarative step pipelines (JSON/YAML flows), so every
+project gets the same tuned hot path instead of its own copy of the
+Options/Service boilerplate.
+"""
+from element_wait import wait_for_element, wait_for_element_cdp
+from events import emit
+from metrics import StepClock, step
+from navigation import NavigationTimeout, navigate_cdp
+from tab_discovery import find_tab, switch_to_tab
+
+from gpm_runtime.attach import attach_driver, get_pool, release_driver, use_pool
+from gpm_runtime.context import RunContext, automation
+from gpm_runtime.network import NetworkFilter
+from gpm_runtime.pipeline import Pipeline, Step, StepFailed
+
+__all__ = [
+    "NavigationTimeout",
+    "NetworkFilter",
+    "Pipeline",
+    "RunContext",
+    "Step",
+    "StepFailed",
+    "StepClock",
+    "attach_driver",
+    "automation",
+    "emit",
+    "find_tab",
+    "get_pool",
+    "navigate_cdp",
+    "release_driver",
+    "step",
+    "switch_to_tab",
+    "use_pool",
+    "wait_for_element",
+    "wait_for_element_cdp",
+]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+The one way project scripts get a WebDriver attached to a GPM browser
+
+Waits for the debug port with backoff, then leases a session from the
+driver pool (which retries the attach and health-checks reused sessions).
+Inside the API server the server's pool is used; a script run on its own
+gets a process-local pool.
+"""
+import os
+import threading
+from typing import Optional
+
+from driver_pool import DriverPool
+from metrics import step
+from port_probe import wait_port_ready_sync
+
+PORT_READY_TIMEOUT = float(os.getenv("GPM_PORT_READY_TIMEOUT", "15"))
+
+_pool: Optional[DriverPool] = None
+_pool_lock = threading.Lock()
+
+
+def use_pool(pool: DriverPool):
+    """Make attach_driver() lease from pool (the API server registers its own)"""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+
+def get_pool() -> DriverPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool(idle_timeout=float(os.getenv("GPM_DRIVER_IDLE_TIMEOUT", "300")))
+            _pool.start()
+        return _pool
+
+
+def attach_driver(address: str, driver_path: str = "", port_timeout: float = PORT_READY_TIMEOUT):
+    """Leased WebDriver attached to the browser at address; hand it back with release_driver()"""
+    with step("attach"):
+        if not wait_port_ready_sync(address, timeout=port_timeout, check_devtools=True):
+            raise RuntimeError(f"DevTools at {address} is not responding")
+        return get_pool().acquire(address, driver_path)
+
+
+def release_driver(driver, discard: bool = False):
+    get_pool().release(driver, discard=discard)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+RunContext: everything a project script needs, ready to use
+
+    from gpm_runtime import automation
+
+    USE_DRIVER_POOL = True
+
+    @automation
+    def run(ctx):
+        ctx.select_tab(web_only=True, open_url="https://x.com/home")
+        ctx.lap("open_tab")
+        ctx.wait('//a[@aria-label="Post"]', timeout=10)
+        ctx.lap("timeline")
+
+The server still calls run(profile_data); @automation builds the context,
+and releases the driver afterwards if the context attached it itself.
+@automation(block_resources=..., block_urls=...) also turns on request
+blocking for the job (see gpm_runtime.network).
+"""
+import functools
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import events
+import metrics
+from cdp_client import get_browser
+from element_wait import wait_for_element
+from navigation import navigate_cdp
+from tab_discovery import switch_to_tab
+
+from gpm_runtime.attach import attach_driver, release_driver
+from gpm_runtime.network import NetworkFilter, current_target_id
+
+logger = logging.getLogger("RunContext")
+
+STANDARD_KEYS = ("profile_id", "profile_name", "remote_debugging_address", "browser_location", "driver_path", "driver")
+
+
+class RunContext:
+    def __init__(self, profile_data: Dict[str, Any]):
+        self.profile_data = profile_data
+        self.profile_id = profile_data.get("profile_id")
+        self.address = profile_data["remote_debugging_address"]
+        self.driver_path = profile_data.get("driver_path") or ""
+        self.params = {k: v for k, v in profile_data.items() if k not in STANDARD_KEYS}
+        self.clock = metrics.StepClock()
+        self._driver = profile_data.get("driver")  # Pooled session handed over by the server
+        self._owns_driver = False
+        self.network: Optional[NetworkFilter] = None
+
+    @property
+    def driver(self):
+        """Attached WebDriver (attached on first use when the server did not provide one)"""
+        if self._driver is None:
+            self._driver = attach_driver(self.address, self.driver_path)
+            self._owns_driver = True
+        return self._driver
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.profile_data.get(key, default)
+
+    def select_tab(self, url_contains: Optional[str] = None, web_only: bool = False,
+                   open_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Switch to the first matching tab; open open_url in a new tab if none matches"""
+        tab = switch_to_tab(self.driver, self.address, url_contains=url_contains, web_only=web_only)
+        if tab is None and open_url:
+            tab = self.new_tab(open_url)
+        elif tab is not None and self.network:
+            self.network.attach(tab["id"])
+        return tab
+
+    def new_tab(self, url: str = "about:blank") -> Dict[str, Any]:
+        """Open url in a new tab and switch to it"""
+        self.driver.switch_to.new_window("tab")
+        if self.network:
+            # Before the first load, so the page itself is filtered too
+            self.network.attach(current_target_id(self.driver))
+        if url != "about:blank":
+            self.driver.get(url)
+        return {"id": self.driver.current_window_handle, "url": url}
+
+    def navigate(self, url: Optional[str] = None, wait_until: Optional[str] = "DOMContentLoaded",
+                 url_pattern: Optional[str] = None, locators=None, timeout: float = 30) -> float:
+        """
+        Load url in the current tab and wait for real signals instead of sleeping
+        (lifecycle event, URL regex, visible element; see navigation.navigate_cdp).
+        Without url it only waits, e.g. for the redirect after a click. Returns seconds waited.
+        """
+        target_id = current_target_id(self.driver)
+        if self.network:
+            self.network.attach(target_id)
+        page = get_browser(self.address).attach(target_id)
+        try:
+            return navigate_cdp(page, url, wait_until=wait_until, url_pattern=url_pattern,
+                                locators=locators, timeout=timeout)
+        finally:
+            page.detach()
+
+    def block_network(self, resource_types: Iterable[str] = (), url_patterns: Iterable[str] = (),
+                      current_tab: bool = True) -> NetworkFilter:
+        """
+        Block CDP resource types ("Image", "Media", "Font"...) and URL patterns ("*.mp4")
+        on every tab selected/opened/navigated afterwards (and on the current tab unless
+        current_tab=False), until close().
+        """
+        if self.network is None:
+            self.network = NetworkFilter(self.address, resource_types, url_patterns)
+        if current_tab:
+            self.network.attach(current_target_id(self.driver))
+        return self.network
+
+    def wait(self, locators, timeout: float = 15, click: bool = False, name: str = "Element", adaptive: bool = False):
+        """Wait for the first visible match of locators (see element_wait)"""
+        return wait_for_element(self.driver, locators, timeout=timeout, click=click, name=name, adaptive=adaptive)
+
+    def lap(self, name: str) -> float:
+        return self.clock.lap(name)
+
+    def step(self, name: str):
+        return metrics.step(name)
+
+    def emit(self, message: str, **data):
+        events.emit(message, **data)
+
+    def close(self, discard: bool = False):
+        if self.network is not None:
+            try:
+                self.network.close()
+            except Exception as e:
+                logger.warning(f"Network filter cleanup failed: {e}")
+            self.network = None
+        if self._owns_driver and self._driver is not None:
+            release_driver(self._driver, discard=discard)
+        self._driver = None
+        self._owns_driver = False
+
+    def __enter__(self) -> "RunContext":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def automation(fn: Optional[Callable[[RunContext], Any]] = None, *,
+               block_resources: Iterable[str] = (), block_urls: Iterable[str] = ()):
+    """
+    Turn run(ctx) into the run(profile_data) entry point the API server calls.
+
+    Used bare (@automation) or with request blocking for the whole job:
+    @automation(block_resources=("Image", "Media"), block_urls=("*doubleclick.net*",))
+    """
+    def decorate(fn: Callable[[RunContext], Any]) -> Callable[[Dict[str, Any]], Any]:
+        @functools.wraps(fn)
+        def run(profile_data: Dict[str, Any]):
+            with RunContext(profile_data) as ctx:
+                if block_resources or block_urls:
+                    try:
+                        # Not the tab the pooled driver happens to be on (it may be an extension
+                        # popup): only tabs the job selects, opens or navigates get filtered
+                        ctx.block_network(block_resources, block_urls, current_tab=False)
+                    except Exception as e:
+                        # Blocking only saves bandwidth: run the job unfiltered rather than fail it
+                        logger.warning(f"Network filter not applied: {e}")
+                return fn(ctx)
+        return run
+
+    return decorate(fn) if fn is not None else decorate
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative step pipelines
+
+A flow is an ordered list of steps. Each step names fallback locators, an
+action, and optionally a postcondition (`skip_if`) and a success condition
+(`until`). For every step the engine runs ONE in-page wait racing the
+postcondition against the target locators, so "already past this screen"
+and "screen is ready" are checked in parallel and the step is skipped the
+moment its postcondition holds. No fixed sleeps: everything waits on DOM
+mutations (see element_wait). Every step is timed as a script step.
+
+Flows can be written in Python or loaded from JSON/YAML:
+
+    name: okx_import
+    steps:
+      - name: import_button
+        locators: ['//*[@data-testid="onboard-page-import-wallet-button"]', 'text=Import wallet']
+        action: click
+        skip_if: ['//input']
+        optional: true
+      - name: password
+        locators: ['//input[@type="password"]']
+        action: type_all
+        value: "{password}"
+
+Step fields:
+    name        Step name (timing key, progress events)
+    action      click | js_click | type | type_all | paste | js | navigate | tab | wait
+                (click is a native WebElement click, js_click a DOM click() that ignores overlays)
+    locators    Fallback locators for the target element (not needed for navigate/tab)
+    value       Text / URL / JS for the action; "{param}" placeholders are filled from
+                profile_data (a missing param fails the step), other braces are kept
+    url_contains  For action "tab": tab to select before opening `value`
+    skip_if     Locators whose presence means the step is already done (steps with locators only)
+    until       Locators that must appear after the action (success condition)
+    optional    A failing optional step is logged and skipped
+    timeout     Seconds to wait for the target (default 15)
+"""
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import events
+import metrics
+from element_wait import normalize_locators, wait_for_element
+
+try:
+    import yaml
+except ImportError:  # YAML flows are optional, JSON always works
+    yaml = None
+
+logger = logging.getLogger("Pipeline")
+
+ACTIONS = ("click", "js_click", "type", "type_all", "paste", "js", "navigate", "tab", "wait")
+
+# All visible elements matching one normalized locator
+FIND_ALL_JS = r"""
+const loc = arguments[0];
+function visible(el) {
+    if (!el || !el.isConnected) return false;
+    const style = window.getComputedStyle(el);
+    if (style.visibility === 'hidden' || style.display === 'none') return false;
+    return el.getClientRects().length > 0;
+}
+let els = [];
+if (loc.type === 'xpath') {
+    const snap = document.evaluate(loc.value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < snap.snapshotLength; i++) els.push(snap.snapshotItem(i));
+} else if (loc.type === 'css') {
+    els = Array.from(document.querySelectorAll(loc.value));
+} else {
+    const needle = loc.value.trim().toLowerCase();
+    els = Array.from(document.querySelectorAll('button, a, div, span, p, label, li'))
+        .filter(e => e.textContent.trim().toLowerCase().includes(needle));
+}
+return els.filter(visible);
+"""
+
+# Paste text into an input the way a user would (React listens for the paste event)
+PASTE_JS = r"""
+const el = arguments[0], text = arguments[1];
+el.focus();
+const data = new DataTransfer();
+data.setData('text/plain', text);
+el.dispatchEvent(new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true}));
+return true;
+"""
+
+
+class StepFailed(Exception):
+    """A required step could not be completed"""
+
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def _fill(value: str, params: Dict[str, Any]) -> str:
+    """Replace {name} placeholders with params; JS braces and other text stay as they are"""
+    def replace(match):
+        if match.group(1) not in params:
+            raise StepFailed(f"Missing param {match.group(1)!r}")
+        return str(params[match.group(1)])
+    return PLACEHOLDER.sub(replace, value)
+
+
+@dataclass
+class Step:
+    name: str
+    action: str = "click"
+    locators: List[Any] = field(default_factory=list)
+    value: Optional[str] = None
+    url_contains: Optional[str] = None
+    skip_if: List[Any] = field(default_factory=list)
+    until: List[Any] = field(default_factory=list)
+    optional: bool = False
+    timeout: float = 15
+
+    def __post_init__(self):
+        if self.action not in ACTIONS:
+            raise ValueError(f"Step {self.name}: unknown action {self.action!r} (expected one of {ACTIONS})")
+        # A single locator may be given as a plain string
+        for attr in ("locators", "skip_if", "until"):
+            if isinstance(getattr(self, attr), str):
+                setattr(self, attr, [getattr(self, attr)])
+        if self.action not in ("navigate", "tab") and not self.locators:
+            raise ValueError(f"Step {self.name}: action {self.action!r} needs locators")
+        if self.skip_if and not self.locators:
+            # skip_if is raced against the target locators; without them it would be ignored
+            raise ValueError(f"Step {self.name}: skip_if needs locators to race against")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Step":
+        unknown = sorted(set(data) - set(cls.__dataclass_fields__))
+        if unknown:
+            # A typo ("locator", "optinal") would otherwise silently change what the step does
+            raise ValueError(
+                f"Step {data.get('name', '?')}: unknown keys {unknown} (expected {sorted(cls.__dataclass_fields__)})"
+            )
+        return cls(**data)
+
+
+class Pipeline:
+    """Ordered steps executed against a gpm_runtime.RunContext"""
+
+    def __init__(self, steps: List[Step], name: str = "pipeline"):
+        self.steps = steps
+        self.name = name
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Pipeline":
+        return cls([Step.from_dict(s) for s in data.get("steps", [])], name=data.get("name", "pipeline"))
+
+    @classmethod
+    def from_file(cls, path) -> "Pipeline":
+        """Load a flow from a .json, .yaml or .yml file"""
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix in (".yaml", ".yml"):
+            if yaml is None:
+                raise RuntimeError("PyYAML is not installed: pip install pyyaml (or use a .json flow)")
+            data = yaml.safe_load(text)
+        else:
+            data = json.loads(text)
+        data.setdefault("name", path.stem)
+        return cls.from_dict(data)
+
+    def run(self, ctx) -> List[Dict[str, Any]]:
+        """Execute every step; returns one {step, status, seconds} record per step"""
+        params = dict(ctx.profile_data)
+        report = []
+        for step in self.steps:
+            started = time.perf_counter()
+            try:
+                status = self._run_step(ctx, step, params)
+            except Exception as e:
+                seconds = time.perf_counter() - started
+                metrics.record_step(step.name, seconds)
+                report.append({"step": step.name, "status": "failed", "seconds": round(seconds, 3), "error": str(e)})
+                events.emit(f"{step.name}: {e}", step=step.name, status="failed")
+                if not step.optional:
+                    raise StepFailed(f"[{self.name}] Step {step.name} failed: {e}") from e
+                logger.info(f"[{self.name}] Optional step {step.name} skipped: {str(e)[:100]}")
+                continue
+            seconds = time.perf_counter() - started
+            metrics.record_step(step.name, seconds)
+            report.append({"step": step.name, "status": status, "seconds": round(seconds, 3)})
+            events.emit(step.name, step=step.name, status=status)
+        return report
+
+    def _run_step(self, ctx, step: Step, params: Dict[str, Any]) -> str:
+        driver = ctx.driver
+        value = _fill(step.value, params) if isinstance(step.value, str) else step.value
+
+        if step.action == "navigate":
+            driver.get(value)
+        elif step.action == "tab":
+            if not ctx.select_tab(url_contains=step.url_contains, open_url=value):
+                raise StepFailed(f"No tab matching {step.url_contains!r}")
+
+        if step.locators:
+            # Postcondition and target raced in one in-page wait; postcondition locators come
+            # first so "already done" wins when both are on screen
+            racing = list(step.skip_if) + list(step.locators)
+            element, index = wait_for_element(driver, racing, timeout=step.timeout, name=step.name, with_index=True)
+            if index < len(step.skip_if):
+                return "skipped"
+            self._act(driver, step, element, racing[index], value)
+
+        if step.until:
+            wait_for_element(driver, step.until, timeout=step.timeout, name=f"{step.name} (until)")
+        return "done"
+
+    @staticmethod
+    def _act(driver, step: Step, element, locator, value):
+        if step.action == "click":
+            element.click()
+        elif step.action == "js_click":
+            driver.execute_script("arguments[0].click();", element)
+        elif step.action == "type":
+            element.clear()
+            element.send_keys(value)
+        elif step.action == "type_all":
+            for el in driver.execute_script(FIND_ALL_JS, normalize_locators(locator)[0]) or [element]:
+                el.send_keys(value)
+        elif step.action == "paste":
+            driver.execute_script(PASTE_JS, element, value)
+        elif step.action == "js":
+            driver.execute_script(value, element)
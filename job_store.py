@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent job history (SQLite)
+
+The scheduler hands job snapshots to JobStore.save(), which only enqueues
+them; a background writer thread upserts them in batches, so workers and
+request handlers never wait on disk. Old finished jobs are pruned after
+`retention_days`.
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("JobStore")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    project     TEXT NOT NULL,
+    profile_id  TEXT,
+    address     TEXT,
+    params      TEXT,
+    priority    INTEGER,
+    status      TEXT NOT NULL,
+    error       TEXT,
+    result      TEXT,
+    stages      TEXT,
+    created_at  REAL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_project ON jobs(project);
+CREATE INDEX IF NOT EXISTS idx_jobs_profile ON jobs(profile_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+"""
+
+COLUMNS = ("id", "project", "profile_id", "address", "params", "priority", "status",
+           "error", "result", "stages", "created_at", "started_at", "finished_at")
+JSON_COLUMNS = ("params", "result", "stages")
+
+
+class JobStore:
+    def __init__(self, path: str = "jobs.db", retention_days: float = 7,
+                 flush_interval: float = 0.5):
+        self.path = path
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self._pending = queue.Queue()
+        self._flush_lock = threading.Lock()  # Drain + upsert as one step: snapshots commit in save() order
+        self._stop = threading.Event()
+        self._writer = None
+        self._last_prune = 0.0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------ writes
+
+    def start(self):
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._write_loop, name="job-store-writer", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._writer:
+            self._writer.join(timeout=10)
+            self._writer = None
+
+    def save(self, record: Dict[str, Any]):
+        """Queue a job snapshot (Job.to_dict() shape) for the next batched write"""
+        self._pending.put(record)
+
+    def flush(self):
+        """Write everything queued so far (writer thread, stop, and readers that need fresh data)"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        batch = {}
+        while True:
+            try:
+                record = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            batch[record["job_id"]] = record  # Later snapshots of the same job win
+        if not batch:
+            return
+        rows = [self._to_row(r) for r in batch.values()]
+        placeholders = ",".join("?" for _ in COLUMNS)
+        updates = ",".join(f"{c}=excluded.{c}" for c in COLUMNS if c != "id")
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"INSERT INTO jobs ({','.join(COLUMNS)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to persist {len(rows)} jobs: {e}")
+
+    def prune(self) -> int:
+        """Delete finished jobs older than retention_days; returns the number removed"""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE created_at < ? AND status IN ('done', 'failed', 'cancelled')",
+                (cutoff,)
+            )
+            removed = cursor.rowcount
+        if removed:
+            logger.info(f"Pruned {removed} jobs older than {self.retention_days} days")
+        return removed
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            self.flush()
+            if time.time() - self._last_prune > 3600:
+                self._last_prune = time.time()
+                try:
+                    self.prune()
+                except sqlite3.Error as e:
+                    logger.error(f"Prune failed: {e}")
+        self.flush()
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> tuple:
+        values = {
+            "id": record["job_id"],
+            "project": record.get("project"),
+            "profile_id": record.get("profile_id"),
+            "address": record.get("address"),
+            "params": record.get("params"),
+            "priority": record.get("priority"),
+            "status": record.get("status"),
+            "error": record.get("error"),
+            "result": record.get("result"),
+            "stages": record.get("stages"),
+            "created_at": record.get("created_at"),
+            "started_at": record.get("started_at"),
+            "finished_at": record.get("finished_at"),
+        }
+        for column in JSON_COLUMNS:
+            values[column] = json.dumps(values[column], ensure_ascii=False, default=str)
+        return tuple(values[c] for c in COLUMNS)
+
+    # ------------------------------------------------------------------- reads
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """{job_id: record} for the stored ones among job_ids"""
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(job_ids), 500):  # Stay under SQLite's bound parameter limit
+                chunk = job_ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT * FROM jobs WHERE id IN ({','.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                found.update((r["id"], self._from_row(r)) for r in rows)
+        return found
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        project: Optional[str] = None,
+        profile_id: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        clauses, args = [], []
+        for column, value in (("status", status), ("project", project), ("profile_id", profile_id)):
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since:
+            clauses.append("created_at >= ?")
+            args.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset)
+            ).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for column in JSON_COLUMNS:
+            try:
+                record[column] = json.loads(record[column]) if record[column] else None
+            except ValueError:
+                pass
+        record["job_id"] = record.pop("id")
+        return record
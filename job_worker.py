@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Child process entry point for GPM_RUN_MODE=process
+
+Each scheduler worker thread owns one of these processes and sends it jobs
+over a Pipe. The process keeps its own project module cache and WebDriver
+pool between jobs; the server kills and respawns it when a job times out or
+is cancelled, so a wedged Selenium call can never pin a server thread.
+
+Protocol:
+    parent -> child: (job_id, project_name, request_fields, extra_params) or None to exit
+    child -> parent: ("event", event dict) any number of times while the job runs, then
+                     ("done" | "failed", error message or None, stages dict, result)
+
+The result is run()'s return value made JSON-safe so it always pickles.
+Killing a worker kills its whole process tree (kill_process_tree), so the
+chromedriver/gpmdriver processes its scripts started go down with it.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+import events
+import metrics
+
+try:
+    import psutil
+except ImportError:  # Optional: POSIX falls back to the process group, Windows to taskkill
+    psutil = None
+
+
+def kill_process_tree(pid: int, timeout: float = 5):
+    """Kill pid and every process it started (drivers), descendants collected before anything dies"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = root.children(recursive=True) + [root]
+        except psutil.NoSuchProcess:
+            return
+        for proc in procs:
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+        psutil.wait_procs(procs, timeout=timeout)
+    elif sys.platform == "win32":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True, timeout=timeout)
+    else:
+        try:
+            os.killpg(pid, signal.SIGKILL)  # worker_main made the worker a process group leader
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def worker_main(conn):
+    if hasattr(os, "setsid"):
+        os.setsid()  # Own process group: drivers started by scripts can be killed together with us
+    import api_server  # Imported here: the child builds its own registry and driver pool
+
+    api_server.driver_pool.start()
+    send_lock = threading.Lock()  # Scripts may emit events from their own threads
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def forward(event):
+        try:
+            send(("event", api_server.json_safe(event)))
+        except Exception:
+            pass  # Progress events must never fail a job
+
+    events.set_sink(forward)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+
+            job_id, project_name, request_fields, extra_params = message
+            stages = {}
+            with metrics.job_context(project_name, stages, job_id):
+                try:
+                    data = api_server.AutomationRequest(**request_fields)
+                    result = api_server.run_automation_task(project_name, data, extra_params)
+                    reply = ("done", None, stages, api_server.json_safe(result))
+                except Exception as e:
+                    reply = ("failed", str(e), stages, None)
+            send(reply)
+    finally:
+        api_server.driver_pool.stop()
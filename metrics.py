@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Job timing instrumentation and Prometheus text export
+
+The API server opens a job context around every job; stage spans
+(gpm_start, port_check, module_load, driver_attach, script_run, ...) are
+recorded both on the job itself and in process-wide histograms that
+GET /metrics renders in the Prometheus text format.
+
+Project scripts can time their own steps without knowing about jobs:
+
+    from metrics import step, StepClock
+
+    with step("import_wallet"):
+        ...
+
+    clock = StepClock()
+    ...             # step 1
+    clock.lap("open_ui")
+    ...             # step 2
+    clock.lap("confirm")
+
+Outside the server (script run directly) the timings are simply kept in-process.
+Listeners registered with add_listener() see every stage/step as it is recorded
+(events.py uses this to stream progress).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            value = float("nan")
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+JOB_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "gpm_job_stage_seconds", "Time spent in each job stage", ["project", "stage"]))
+SCRIPT_STEP_SECONDS = REGISTRY.register(Histogram(
+    "gpm_script_step_seconds", "Time spent in script-reported steps", ["project", "step"]))
+JOBS_TOTAL = REGISTRY.register(Counter(
+    "gpm_jobs_total", "Finished jobs by outcome", ["project", "status"]))
+NETWORK_BLOCKED_REQUESTS = REGISTRY.register(Counter(
+    "gpm_network_blocked_requests_total", "Requests blocked by session network filters", ["project", "resource_type"]))
+NETWORK_BYTES_LOADED = REGISTRY.register(Counter(
+    "gpm_network_loaded_bytes_total", "Bytes loaded by tabs with a network filter", ["project"]))
+NETWORK_BYTES_SAVED = REGISTRY.register(Counter(
+    "gpm_network_saved_bytes_estimate_total", "Estimated bytes not downloaded thanks to network filters", ["project"]))
+
+
+# ---------------------------------------------------------------------------
+# Job context
+# ---------------------------------------------------------------------------
+
+_job = contextvars.ContextVar("gpm_job", default=None)  # (project, stages dict, job_id)
+_listeners: List[Callable[[str, str, float], None]] = []
+
+
+@contextmanager
+def job_context(project: str, stages: Optional[Dict[str, float]] = None, job_id: Optional[str] = None):
+    """Make spans/steps inside this block count towards `project` and land in `stages`"""
+    token = _job.set((project, stages if stages is not None else {}, job_id))
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+def current_job() -> Tuple[str, Optional[str]]:
+    """(project, job_id) of the enclosing job context, ("", None) outside of one"""
+    project, _, job_id = _job.get() or ("", None, None)
+    return project, job_id
+
+
+def add_listener(fn: Callable[[str, str, float], None]):
+    """Call fn(kind, name, seconds) for every recorded stage ("stage") and step ("step")"""
+    _listeners.append(fn)
+
+
+def _notify(kind: str, name: str, seconds: float):
+    for fn in _listeners:
+        try:
+            fn(kind, name, seconds)
+        except Exception:
+            pass
+
+
+def record_stage(stage: str, seconds: float, notify: bool = True):
+    project, stages, _ = _job.get() or ("", None, None)
+    JOB_STAGE_SECONDS.observe(seconds, project=project, stage=stage)
+    if stages is not None:
+        stages[stage] = round(stages.get(stage, 0) + seconds, 4)
+    if notify:
+        _notify("stage", stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a server-side job stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_step(name: str, seconds: float, notify: bool = True):
+    project, stages, _ = _job.get() or ("", None, None)
+    SCRIPT_STEP_SECONDS.observe(seconds, project=project, step=name)
+    if stages is not None:
+        key = f"step:{name}"
+        stages[key] = round(stages.get(key, 0) + seconds, 4)
+    if notify:
+        _notify("step", name, seconds)
+
+
+@contextmanager
+def step(name: str):
+    """Time a step inside a project script"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_step(name, time.perf_counter() - started)
+
+
+class StepClock:
+    """Lap timer for long linear scripts: lap(name) records the time since the previous lap"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def lap(self, name: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        record_step(name, elapsed)
+        return elapsed
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Load-state aware navigation (no fixed sleeps after driver.get / clicks)
+
+navigate_cdp() navigates a cdp_client.CDPSession and returns as soon as the
+requested signals hold, instead of sleeping a guessed number of seconds:
+
+    wait_until   Page.lifecycleEvent of the new document: "DOMContentLoaded",
+                 "load", "networkAlmostIdle" or "networkIdle"
+    url_pattern  Regex the page URL must match (redirects, SPA route changes)
+    locators     Element that must be visible (see element_wait)
+
+Every call has a deadline and returns how long it actually waited; a missed
+deadline raises NavigationTimeout. Without a url it only waits (e.g. for the
+redirect after a click): url_pattern and locators still apply.
+
+    page = get_browser(address).attach_page(url_contains="popup.html")
+    waited = navigate_cdp(page, "https://x.com/home", wait_until="DOMContentLoaded")
+    navigate_cdp(page, url_pattern=r"/home$", locators=['//a[@aria-label="Post"]'])
+
+Selenium scripts use RunContext.navigate(), which runs the same wait on the
+driver's current tab.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cdp_client import CDPError
+from element_wait import wait_for_element_cdp
+
+logger = logging.getLogger("Navigation")
+
+LIFECYCLE_EVENTS = ("DOMContentLoaded", "load", "networkAlmostIdle", "networkIdle")
+
+
+class NavigationTimeout(TimeoutError):
+    """A navigation signal did not arrive before the deadline"""
+
+
+class _LoadWatcher:
+    """Collects lifecycle events of a page's main frame (subscribed before navigating)"""
+
+    def __init__(self, page):
+        self.frame_id = page.target_id  # The main frame id of a page target is its target id
+        self.seen = set()               # (loaderId, event name)
+        self.url = None
+        self._changed = threading.Condition()
+        self._unsubscribe = [
+            page.on("Page.lifecycleEvent", self._on_lifecycle),
+            page.on("Page.frameNavigated", self._on_navigated),
+            page.on("Page.navigatedWithinDocument", self._on_navigated),
+        ]
+
+    def _on_lifecycle(self, params: Dict[str, Any]):
+        if params.get("frameId") == self.frame_id:
+            with self._changed:
+                self.seen.add((params.get("loaderId"), params.get("name")))
+                self._changed.notify_all()
+
+    def _on_navigated(self, params: Dict[str, Any]):
+        frame = params.get("frame", params)
+        if frame.get("id", params.get("frameId")) == self.frame_id and frame.get("url"):
+            self.set_url(frame["url"])
+
+    def set_url(self, url: str):
+        with self._changed:
+            self.url = url
+            self._changed.notify_all()
+
+    def wait(self, condition, deadline: float) -> bool:
+        with self._changed:
+            while not condition():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            return True
+
+    def close(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+
+
+def navigate_cdp(
+    page,
+    url: Optional[str] = None,
+    wait_until: Optional[str] = "load",
+    url_pattern: Optional[str] = None,
+    locators=None,
+    timeout: float = 30
+) -> float:
+    """
+    Navigate page to url (if given) and wait for every requested signal.
+
+    Returns:
+        Seconds actually waited
+    Raises:
+        NavigationTimeout if a signal did not arrive within timeout
+    """
+    if wait_until is not None and wait_until not in LIFECYCLE_EVENTS:
+        raise ValueError(f"wait_until must be one of {LIFECYCLE_EVENTS}, got {wait_until!r}")
+    started = time.monotonic()
+    deadline = started + timeout
+    target = url or page.target_id
+
+    page.call("Page.enable")
+    watcher = _LoadWatcher(page)
+    try:
+        if url:
+            if wait_until:
+                page.call("Page.setLifecycleEventsEnabled", {"enabled": True})
+            result = page.call("Page.navigate", {"url": url}, timeout=timeout)
+            if result.get("errorText"):
+                raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+            loader_id = result.get("loaderId")
+            # Same-document navigations (#hash) have no loaderId and no lifecycle events
+            if wait_until and loader_id:
+                if not watcher.wait(lambda: (loader_id, wait_until) in watcher.seen, deadline):
+                    raise NavigationTimeout(f"{target}: no {wait_until} after {timeout}s")
+
+        if url_pattern:
+            pattern = re.compile(url_pattern)
+            watcher.set_url(page.evaluate("location.href", timeout=max(0.1, deadline - time.monotonic())))
+            if not watcher.wait(lambda: bool(watcher.url and pattern.search(watcher.url)), deadline):
+                raise NavigationTimeout(f"{target}: URL {watcher.url} did not match {url_pattern!r} within {timeout}s")
+
+        if locators:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not wait_for_element_cdp(page, locators, timeout=remaining):
+                raise NavigationTimeout(f"{target}: element {locators!r} not visible within {timeout}s")
+    finally:
+        watcher.close()
+
+    waited = time.monotonic() - started
+    logger.info(f"{target}: ready after {waited:.2f}s")
+    return waited
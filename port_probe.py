@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Debug port readiness probes
+
+A freshly started GPM profile needs a variable amount of time before its
+remote debugging port accepts connections and DevTools answers. Instead of
+fixed sleeps, wait_port_ready() probes with exponential backoff until a
+deadline. Everything is asyncio based so many profiles can be probed at once
+from the API server's event loop; scripts can use wait_port_ready_sync().
+"""
+import asyncio
+import socket
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # Optional: only used to find out when a browser was started
+    psutil = None
+
+
+def split_address(address: str) -> Tuple[str, int]:
+    host, port = address.split(':')
+    return host, int(port)
+
+
+def check_port(host: str, port: int) -> bool:
+    """Verify if a port is listening (blocking, 1s timeout)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(1)
+    result = sock.connect_ex((host, port))
+    sock.close()
+    return result == 0
+
+
+def listener_started_at(address: str) -> Optional[float]:
+    """Creation time (epoch) of the local process listening on address; None if unknown (or no psutil)"""
+    if psutil is None:
+        return None
+    _, port = split_address(address)
+    try:
+        for conn in psutil.net_connections(kind="tcp"):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+                return psutil.Process(conn.pid).create_time()
+    except (psutil.Error, OSError):
+        return None
+    return None
+
+
+async def probe_port(address: str, timeout: float = 1.0) -> bool:
+    """True if a TCP connection to address succeeds within timeout"""
+    host, port = split_address(address)
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def probe_devtools(address: str, timeout: float = 2.0) -> bool:
+    """True if GET /json/version on address answers 200 (DevTools is really up)"""
+    host, port = split_address(address)
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET /json/version HTTP/1.1\r\nHost: {address}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        return b" 200 " in status_line
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer:
+            writer.close()
+
+
+async def wait_port_ready(
+    address: str,
+    timeout: float = 15.0,
+    check_devtools: bool = False,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    factor: float = 2.0,
+    probe_timeout: float = 1.0
+) -> bool:
+    """
+    Wait until address accepts connections (and DevTools answers if check_devtools)
+
+    Args:
+        address: "host:port"
+        timeout: Overall deadline in seconds
+        check_devtools: Also require GET /json/version to succeed
+        initial_delay: First backoff delay
+        max_delay: Backoff cap
+        factor: Backoff multiplier
+        probe_timeout: Timeout of a single probe
+
+    Returns:
+        True once ready, False if the deadline passed
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        probe_budget = min(probe_timeout, remaining)
+        if await probe_port(address, probe_budget):
+            if not check_devtools or await probe_devtools(address, min(2 * probe_timeout, remaining)):
+                return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * factor, max_delay)
+
+
+async def probe_many(addresses: Iterable[str], **kwargs) -> Dict[str, bool]:
+    """Run wait_port_ready for many addresses concurrently; returns {address: ready}"""
+    addresses = list(dict.fromkeys(addresses))
+    results = await asyncio.gather(*(wait_port_ready(a, **kwargs) for a in addresses))
+    return dict(zip(addresses, results))
+
+
+def wait_port_ready_sync(address: str, **kwargs) -> bool:
+    """wait_port_ready for synchronous code (project scripts, worker threads)"""
+    return asyncio.run(wait_port_ready(address, **kwargs))
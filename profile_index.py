@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Local index of GPM profiles and groups (SQLite)
+
+Listing or searching profiles through the GPM API means paging over every
+profile each time, and GPM only searches by name. The index keeps a local
+copy (id, name, group, proxy, browser, note, created_at) that answers
+filtered queries without touching GPM:
+
+    index = ProfileIndex(GPMClient())
+    index.sync()                                   # incremental
+    index.query(group_id="3", proxy="gw.example", browser_version="119")
+
+Incremental sync reads profiles newest first and stops after a full page of
+profiles that are already indexed and unchanged, so it only costs a page or
+two when nothing was added. GPM exposes no "updated since", so edits to older
+profiles and deletions are picked up by a full sync (forced, or automatically
+once `full_sync_interval` has passed). A listing that GPM refuses or that
+comes back shorter than its reported total never deletes anything.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("ProfileIndex")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id              TEXT PRIMARY KEY,
+    name            TEXT,
+    group_id        TEXT,
+    raw_proxy       TEXT,
+    browser_type    TEXT,
+    browser_version TEXT,
+    note            TEXT,
+    created_at      TEXT,
+    data            TEXT,
+    synced_at       REAL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_group ON profiles(group_id);
+CREATE INDEX IF NOT EXISTS idx_profiles_browser ON profiles(browser_version);
+CREATE TABLE IF NOT EXISTS groups (
+    id         TEXT PRIMARY KEY,
+    name       TEXT,
+    data       TEXT,
+    synced_at  REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = ("id", "name", "group_id", "raw_proxy", "browser_type", "browser_version", "note", "created_at")
+
+NEWEST_FIRST = 0  # GPM sort: 0 - newest, 1 - old to new
+
+
+class ProfileIndex:
+    def __init__(self, client, path: str = "profiles.db", page_size: int = 100,
+                 full_sync_interval: float = 86400):
+        self.client = client  # api_client.GPMClient
+        self.path = path
+        self.page_size = page_size
+        self.full_sync_interval = full_sync_interval
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -------------------------------------------------------------------- sync
+
+    def sync(self, full: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Bring the index up to date with GPM.
+
+        full=None picks a full sync when the last one is older than
+        full_sync_interval (or never happened), incremental otherwise.
+        """
+        with self._sync_lock:
+            if full is None:
+                full = time.time() - self._meta_float("last_full_sync") > self.full_sync_interval
+            started = time.monotonic()
+            self.sync_groups()
+            report = self._sync_full() if full else self._sync_incremental()
+            now = time.time()
+            self._set_meta("last_sync", now)
+            if full:
+                self._set_meta("last_full_sync", now)
+            report["mode"] = "full" if full else "incremental"
+            report["seconds"] = round(time.monotonic() - started, 3)
+            logger.info(f"Profile index {report['mode']} sync: {report}")
+            return report
+
+    def ensure_fresh(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """Sync only when the last sync is older than max_age seconds"""
+        if time.time() - self._meta_float("last_sync") <= max_age:
+            return None
+        return self.sync()
+
+    def sync_groups(self) -> int:
+        groups = self.client.get_groups()
+        if not groups:
+            return 0  # GPM unreachable (get_groups swallows errors): keep what we have
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM groups")
+            conn.executemany(
+                "INSERT INTO groups (id, name, data, synced_at) VALUES (?, ?, ?, ?)",
+                [(str(g.get("id")), g.get("name"), json.dumps(g, ensure_ascii=False), now) for g in groups]
+            )
+        return len(groups)
+
+    def _sync_incremental(self) -> Dict[str, Any]:
+        known = self._fingerprints()
+        batch, added, updated, fetched, unchanged_run = [], 0, 0, 0, 0
+        # Newest first: stop after a whole page of already indexed, unchanged profiles
+        for profile in self.client.iter_profiles(page_size=self.page_size, sort=NEWEST_FIRST, prefetch=1):
+            fetched += 1
+            previous = known.get(profile.get("id"))
+            if previous == self._fingerprint(profile):
+                unchanged_run += 1
+                if unchanged_run >= self.page_size:
+                    break
+                continue
+            unchanged_run = 0
+            batch.append(profile)
+            if previous is None:
+                added += 1
+            else:
+                updated += 1
+        self.upsert(batch)
+        return {"fetched": fetched, "added": added, "updated": updated, "removed": 0}
+
+    def _sync_full(self) -> Dict[str, Any]:
+        known = self._fingerprints()
+        total = self.client.count_profiles()
+        profiles = list(self.client.iter_profiles(page_size=self.page_size))
+        seen = {p.get("id") for p in profiles}
+        changed = [p for p in profiles if known.get(p.get("id")) != self._fingerprint(p)]
+        self.upsert(changed)
+        gone = [pid for pid in known if pid not in seen]
+        if len(seen) < total:
+            # Incomplete listing (GPM hiccup, or deletions mid-scan): deleting would drop live profiles
+            logger.warning(f"Full sync saw {len(seen)} of {total} profiles; keeping {len(gone)} unseen profiles")
+            gone = []
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM profiles WHERE id = ?", [(pid,) for pid in gone])
+        added = sum(1 for p in changed if p.get("id") not in known)
+        return {"fetched": len(profiles), "added": added, "updated": len(changed) - added, "removed": len(gone)}
+
+    def upsert(self, profiles: Iterable[Dict[str, Any]]) -> int:
+        """Store profile dicts as returned by GPM (also used to refresh single profiles after an update)"""
+        now = time.time()
+        rows = [
+            tuple(self._value(p, c) for c in COLUMNS) + (json.dumps(p, ensure_ascii=False, default=str), now)
+            for p in profiles if p.get("id")
+        ]
+        if not rows:
+            return 0
+        placeholders = ",".join("?" for _ in range(len(COLUMNS) + 2))
+        updates = ",".join(f"{c}=excluded.{c}" for c in COLUMNS[1:] + ("data", "synced_at"))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO profiles ({','.join(COLUMNS)}, data, synced_at) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                rows
+            )
+        return len(rows)
+
+    # ------------------------------------------------------------------- reads
+
+    def query(
+        self,
+        group_id: Optional[str] = None,
+        proxy: Optional[str] = None,
+        note: Optional[str] = None,
+        browser_version: Optional[str] = None,
+        browser_type: Optional[str] = None,
+        name: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Profiles matching every given filter, oldest first.
+
+        group_id, browser_version and browser_type match exactly; proxy, note
+        and name are case-insensitive substrings ("" proxy = profiles without one).
+        """
+        clauses, args = [], []
+        for column, value in (("group_id", group_id), ("browser_version", browser_version),
+                              ("browser_type", browser_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(str(value))
+        for column, value in (("raw_proxy", proxy), ("note", note), ("name", name)):
+            if value == "":
+                clauses.append(f"COALESCE({column}, '') = ''")
+            elif value is not None:
+                clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+                args.append("%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT data FROM profiles {where} ORDER BY created_at, id LIMIT ? OFFSET ?",
+                (*args, -1 if limit is None else limit, offset)
+            ).fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def get_many(self, profile_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """{profile_id: profile} for the indexed ones among profile_ids"""
+        ids = list(dict.fromkeys(profile_ids))
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(ids), 500):  # Stay under SQLite's bound parameter limit
+                chunk = ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT id, data FROM profiles WHERE id IN ({','.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                found.update((r["id"], json.loads(r["data"])) for r in rows)
+        return found
+
+    def groups(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT data FROM groups ORDER BY id").fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            profiles = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+            groups = conn.execute("SELECT COUNT(*) FROM groups").fetchone()[0]
+        return {
+            "profiles": profiles,
+            "groups": groups,
+            "last_sync": self._meta_float("last_sync") or None,
+            "last_full_sync": self._meta_float("last_full_sync") or None,
+        }
+
+    # ----------------------------------------------------------------- helpers
+
+    @staticmethod
+    def _value(profile: Dict[str, Any], column: str) -> Optional[str]:
+        value = profile.get(column)
+        return None if value is None else str(value)
+
+    @classmethod
+    def _fingerprint(cls, profile: Dict[str, Any]) -> tuple:
+        return tuple(cls._value(profile, c) for c in COLUMNS)
+
+    def _fingerprints(self) -> Dict[str, tuple]:
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {','.join(COLUMNS)} FROM profiles").fetchall()
+        return {r["id"]: tuple(r[c] for c in COLUMNS) for r in rows}
+
+    def _meta_float(self, key: str) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return float(row["value"]) if row else 0.0
+
+    def _set_meta(self, key: str, value: Any):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, str(value))
+            )
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Lifecycle of the GPM profiles (browsers) the server opens
+
+Every job that needs a profile acquires it and releases it when the job
+ends, so the manager knows how many jobs are using each open browser. A
+reaper closes profiles that stayed unused for `idle_timeout` seconds, and
+opening a new profile beyond `max_open` first closes the least recently
+used idle one (or waits for one to become idle). Only profiles the server
+provably started are owned; the rest (opened by hand or by another tool, or
+of unknown origin) are never reaped, evicted or closed on shutdown, and do
+not count against `max_open`. Ownership is re-decided on every GPM start.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("ProfileManager")
+
+
+class ProfileCapacityError(Exception):
+    """Raised when no browser slot frees up before the deadline"""
+
+
+class ManagedProfile:
+    def __init__(self, profile_id: str, address: str, driver_path: str, owned: bool = False):
+        self.profile_id = profile_id
+        self.address = address
+        self.driver_path = driver_path
+        self.owned = owned  # False: not provably started by us, leave it alone
+        self.opened_at = time.time()
+        self.last_used = self.opened_at
+        self.active_jobs = 0
+
+
+class ProfileLifecycleManager:
+    """
+    Reference-counted registry of open profiles with idle close and LRU eviction.
+
+    start_fn(profile_id) -> (address, driver_path, owned) opens (or finds) the
+    browser; owned is None when no start was needed (ownership unchanged).
+    close_fn(profile_id, address) closes it.
+    """
+
+    def __init__(
+        self,
+        start_fn: Callable[[str], Awaitable[Tuple[str, str, Optional[bool]]]],
+        close_fn: Callable[[str, str], Awaitable[Any]],
+        idle_timeout: float = 300,
+        max_open: int = 20,
+        slot_timeout: float = 60
+    ):
+        self.start_fn = start_fn
+        self.close_fn = close_fn
+        self.idle_timeout = idle_timeout
+        self.max_open = max_open
+        self.slot_timeout = slot_timeout
+        self._profiles = OrderedDict()  # profile_id -> ManagedProfile, least recently used first
+        self._starting = 0              # Slots reserved by starts in flight
+        self._lock = threading.Lock()   # release() is called from worker threads
+        self._start_locks = {}          # profile_id -> asyncio.Lock
+        self.opened = 0
+        self.closed_idle = 0
+        self.evicted = 0
+
+    async def acquire(self, profile_id: str) -> Tuple[str, str]:
+        """Open (or reuse) a profile and count one more active job on it"""
+        lock = self._start_locks.setdefault(profile_id, asyncio.Lock())
+        async with lock:
+            with self._lock:
+                known = profile_id in self._profiles
+            if not known:
+                await self._reserve_slot()
+            try:
+                address, driver_path, owned = await self.start_fn(profile_id)
+            finally:
+                if not known:
+                    with self._lock:
+                        self._starting -= 1
+            with self._lock:
+                entry = self._profiles.get(profile_id)
+                if entry is None:
+                    entry = ManagedProfile(profile_id, address, driver_path, owned=bool(owned))
+                    self._profiles[profile_id] = entry
+                    if entry.owned:
+                        self.opened += 1
+                elif owned is not None and owned != entry.owned:
+                    # Started again through GPM (e.g. a hand-opened browser was closed meanwhile)
+                    entry.owned = owned
+                    entry.opened_at = time.time()
+                    if owned:
+                        self.opened += 1
+                entry.address, entry.driver_path = address, driver_path
+                entry.active_jobs += 1
+                entry.last_used = time.time()
+                self._profiles.move_to_end(profile_id)
+        return address, driver_path
+
+    def release(self, profile_id: str):
+        """A job on profile_id finished (thread-safe)"""
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+            if entry:
+                entry.active_jobs = max(0, entry.active_jobs - 1)
+                entry.last_used = time.time()
+
+    def forget(self, profile_id: str) -> Optional[ManagedProfile]:
+        """Stop tracking a profile that was closed elsewhere"""
+        self._start_locks.pop(profile_id, None)
+        with self._lock:
+            return self._profiles.pop(profile_id, None)
+
+    async def close(self, profile_id: str) -> bool:
+        """Close a tracked profile now; False if the server did not open it"""
+        entry = self.forget(profile_id)
+        if entry:
+            await self._close(entry)
+        return entry is not None
+
+    async def reap_idle(self) -> int:
+        now = time.time()
+        with self._lock:
+            victims = [
+                e for e in self._profiles.values()
+                if e.owned and e.active_jobs == 0 and now - e.last_used > self.idle_timeout
+            ]
+            for entry in victims:
+                del self._profiles[entry.profile_id]
+        for entry in victims:
+            logger.info(f"Closing idle profile {entry.profile_id} (idle {now - entry.last_used:.0f}s)")
+            self._start_locks.pop(entry.profile_id, None)
+            await self._close(entry)
+        self.closed_idle += len(victims)
+        return len(victims)
+
+    async def run(self):
+        """Reaper loop; run as a background task for the lifetime of the server"""
+        while True:
+            await asyncio.sleep(min(30.0, self.idle_timeout))
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logger.error(f"Idle profile reaper failed: {e}")
+
+    async def close_idle(self):
+        """Close every profile without active jobs (server shutdown)"""
+        with self._lock:
+            victims = [e for e in self._profiles.values() if e.owned and e.active_jobs == 0]
+            for entry in victims:
+                del self._profiles[entry.profile_id]
+        await asyncio.gather(*(self._close(e) for e in victims))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            profiles = [
+                {
+                    "profile_id": e.profile_id,
+                    "address": e.address,
+                    "owned": e.owned,
+                    "active_jobs": e.active_jobs,
+                    "idle_for": round(now - e.last_used, 1) if e.active_jobs == 0 else 0,
+                    "age": round(now - e.opened_at, 1),
+                }
+                for e in self._profiles.values()
+            ]
+            starting = self._starting
+        return {
+            "max_open": self.max_open,
+            "idle_timeout": self.idle_timeout,
+            "open": sum(1 for p in profiles if p["owned"]),
+            "not_owned": sum(1 for p in profiles if not p["owned"]),
+            "starting": starting,
+            "opened": self.opened,
+            "closed_idle": self.closed_idle,
+            "evicted": self.evicted,
+            "profiles": profiles,
+        }
+
+    def open_count(self) -> int:
+        """Profiles the server opened itself (those that count against max_open)"""
+        with self._lock:
+            return self._owned_count()
+
+    def _owned_count(self) -> int:
+        return sum(1 for e in self._profiles.values() if e.owned)
+
+    async def _reserve_slot(self):
+        """Reserve room for one more browser, evicting the LRU idle profile or waiting"""
+        deadline = time.monotonic() + self.slot_timeout
+        while True:
+            victim = None
+            with self._lock:
+                if self.max_open <= 0 or self._owned_count() + self._starting < self.max_open:
+                    self._starting += 1
+                    return
+                victim = next((e for e in self._profiles.values() if e.owned and e.active_jobs == 0), None)
+                if victim:
+                    del self._profiles[victim.profile_id]
+                    self._starting += 1
+            if victim:
+                logger.info(f"Evicting least recently used profile {victim.profile_id} (max {self.max_open} open)")
+                self.evicted += 1
+                self._start_locks.pop(victim.profile_id, None)
+                await self._close(victim)
+                return
+            if time.monotonic() > deadline:
+                raise ProfileCapacityError(f"All {self.max_open} browser slots are busy")
+            await asyncio.sleep(0.25)
+
+    async def _close(self, entry: ManagedProfile):
+        try:
+            await self.close_fn(entry.profile_id, entry.address)
+        except Exception as e:
+            logger.warning(f"Closing profile {entry.profile_id} failed: {e}")
+
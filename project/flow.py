@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Chạy một flow khai báo (JSON/YAML) trong thư mục flows/
+Gọi: /execute/flow?profile_id=ID&flow=okx_import&mnemonic=...&password=...
+Các tham số khác được điền vào "{ten_tham_so}" trong flow.
+"""
+import encoding_fix  # Fix Windows console encoding - must be first import
+
+from pathlib import Path
+from gpm_runtime import Pipeline, automation
+
+# Ask the API server for a pooled, already attached WebDriver (profile_data["driver"])
+USE_DRIVER_POOL = True
+
+FLOWS_DIR = Path(__file__).resolve().parent.parent / "flows"
+
+
+def find_flow(name):
+    """Đường dẫn file flow theo tên (ưu tiên .yaml, .yml rồi .json)"""
+    if not name or Path(name).name != name:
+        raise ValueError(f"Tên flow không hợp lệ: {name!r}")
+    for ext in (".yaml", ".yml", ".json"):
+        path = FLOWS_DIR / f"{name}{ext}"
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"Không tìm thấy flow '{name}' trong {FLOWS_DIR}")
+
+
+@automation
+def run(ctx):
+    path = find_flow(ctx.get("flow"))
+    print(f">>> [FLOW] Chạy {path.name} trên {ctx.address}...")
+    report = Pipeline.from_file(path).run(ctx)
+    print(f">>> [FLOW] Hoàn tất {path.name}: " + ", ".join(f"{r['step']}={r['status']}" for r in report))
+    return report
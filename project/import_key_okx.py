@@ -1,93 +1,65 @@
 # -*- coding: utf-8 -*-
 import encoding_fix  # BẮT BUỘC: Fix lỗi font chữ trên Windows
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from selenium.common.exceptions import TimeoutException
 import time
 import logging
+from element_wait import wait_for_element
+from events import emit
+from gpm_runtime import automation
+from tab_discovery import switch_to_tab
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("OKX_Auto")
 
-def run(profile_data):
+# Ask the API server for a pooled, already attached WebDriver (profile_data["driver"])
+USE_DRIVER_POOL = True
+
+@automation
+def run(ctx):
     """
     Script automation cho ví OKX tối ưu tốc độ và độ ổn định.
+    ctx: gpm_runtime.RunContext (kết nối chờ port có backoff, dùng pool + retry, tự trả session khi xong)
     """
     PROJECT_NAME = "OKX (v2.1)"
-    mnemonic_phrase = profile_data.get('mnemonic', "buddy off slide lounge hurry ankle base spoon video coconut surge hover")
-    password = profile_data.get('password', "AlanTruong@113")
-    debug_address = profile_data.get('remote_debugging_address')
+    mnemonic_phrase = ctx.get('mnemonic', "buddy off slide lounge hurry ankle base spoon video coconut surge hover")
+    password = ctx.get('password', "AlanTruong@113")
+    debug_address = ctx.address
     
     logger.info(f">>> [{PROJECT_NAME}] Bắt đầu: {debug_address}...")
     
     driver = None
     
-    def init_driver(address, path, retries=5):
-        """Khởi tạo Driver với cơ chế thử lại nếu port chưa sẵn sàng"""
-        for i in range(retries):
-            try:
-                opts = Options()
-                opts.add_experimental_option("debuggerAddress", address)
-                # Tăng timeout kết nối
-                # opts.add_argument("--proxy-server='direct://'")
-                # opts.add_argument("--proxy-bypass-list=*")
-                
-                service = Service(executable_path=path) if path else Service()
-                d = webdriver.Chrome(service=service, options=opts)
-                # Test thử kết nối
-                d.current_url
-                return d
-            except Exception as e:
-                logger.warning(f"Thử kết nối lần {i+1} thất bại: {str(e)[:100]}")
-                time.sleep(2)
-        raise Exception(f"Không thể kết nối tới trình duyệt tại {address} sau {retries} lần thử.")
-
     def find_and_switch_to_ui(silent=False):
-        """Tìm tab extension OKX một cách bền bỉ"""
+        """Tìm tab extension OKX qua /json (1 lần đọc, bỏ qua background/offscreen) rồi chuyển thẳng tới handle"""
         try:
-            handles = driver.window_handles
-            if not silent: logger.info(f"[{PROJECT_NAME}] Quét {len(handles)} cửa sổ...")
-            
-            for h in handles:
-                try:
-                    driver.switch_to.window(h)
-                    url = driver.current_url
-                    if "mcohilncbfahbmgdjkbpemcciiolgcge" in url:
-                        if any(x in url for x in ["offscreen.html", "background.html", "generated_background"]):
-                            continue
-                        return True
-                except:
-                    continue
+            tab = switch_to_tab(driver, debug_address, url_contains="mcohilncbfahbmgdjkbpemcciiolgcge")
+            if tab and not silent: logger.info(f"[{PROJECT_NAME}] Đã chọn tab: {tab['url']}")
+            return tab is not None
         except Exception as e:
-            if not silent: logger.error(f"Lỗi khi duyệt handles: {e}")
+            if not silent: logger.error(f"Lỗi khi tìm tab OKX: {e}")
         return False
 
-    def wait_for_element_safe(xpaths, timeout=15, name="Element"):
-        """Chờ element với danh sách XPaths dự phòng"""
-        if isinstance(xpaths, str):
-            xpaths = [xpaths]
-            
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+    def wait_for_element_safe(xpaths, timeout=15, name="Element", adaptive=False):
+        """
+        Chờ element với danh sách XPaths dự phòng (MutationObserver trong trang, không polling).
+        adaptive=True chỉ dùng khi các XPath cùng trỏ tới một nút (dự phòng thuần), không dùng cho
+        danh sách có thứ tự ưu tiên: thống kê có thể đảo thứ tự và bấm nhầm nút ưu tiên thấp hơn.
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutException(f"Không tìm thấy {name}")
             try:
-                # Đảm bảo handle vẫn sống
-                try: driver.current_url
-                except: find_and_switch_to_ui(silent=True)
-
-                for xpath in xpaths:
-                    elements = driver.find_elements(By.XPATH, xpath)
-                    for el in elements:
-                        if el.is_displayed():
-                            return el
-            except:
+                return wait_for_element(driver, xpaths, timeout=remaining, name=name, adaptive=adaptive)
+            except TimeoutException:
+                raise
+            except Exception:
+                # Trang bị điều hướng hoặc handle đã chết: tìm lại UI rồi chờ tiếp
                 find_and_switch_to_ui(silent=True)
-            time.sleep(0.5)
-        raise TimeoutException(f"Không tìm thấy {name}")
+                time.sleep(0.2)
 
     def inject_mnemonic_js(phrase):
         """Dán mnemonic cực nhanh và trigger sự kiện React"""
@@ -126,15 +98,18 @@ def run(profile_data):
             return False
 
     try:
-        driver = init_driver(debug_address, profile_data.get('driver_path'))
+        clock = ctx.clock
+        driver = ctx.driver
+        clock.lap("connect")
 
         # Bước 1: Điều hướng tới OKX
         if not find_and_switch_to_ui():
             target_url = "chrome-extension://mcohilncbfahbmgdjkbpemcciiolgcge/popup.html#/initialize"
-            driver.execute_script(f"window.open('{target_url}', '_blank');")
-            time.sleep(1)
-            if not find_and_switch_to_ui():
+            # Mở tab mới và chuyển thẳng vào đó (driver.get chờ trang tải xong, không cần sleep)
+            ctx.new_tab(target_url)
+            if "mcohilncbfahbmgdjkbpemcciiolgcge" not in driver.current_url:
                 raise Exception("Không tìm thấy giao diện OKX")
+        clock.lap("open_ui")
 
         # Bước 2: Bấm Import (Xử lý cả trường hợp đã ở màn hình trong)
         try:
@@ -142,30 +117,33 @@ def run(profile_data):
                 '//*[@data-testid="onboard-page-import-wallet-button"]',
                 '//*[text()="Import wallet" or text()="Nhập ví"]',
                 '//button[contains(., "Import")]'
-            ], timeout=7, name="Nút Import")
+            ], timeout=7, name="Nút Import", adaptive=True)
             driver.execute_script("arguments[0].click();", import_btn)
         except:
             logger.info("Có thể đã qua bước Import, tiếp tục...")
+        clock.lap("import_button")
 
         # Bước 3: Chọn Seed Phrase
         try:
             seed_btn = wait_for_element_safe([
                 '//*[@data-testid="onboard-page-import-seed-phrase-or-private-key"]',
                 '//*[contains(text(), "Seed phrase") or contains(text(), "Cụm từ")]'
-            ], timeout=7, name="Nút Seed Phrase")
+            ], timeout=7, name="Nút Seed Phrase", adaptive=True)
             driver.execute_script("arguments[0].click();", seed_btn)
         except:
             logger.info("Có thể đã ở trang nhập Key, tiếp tục...")
+        clock.lap("seed_phrase_button")
 
         # Bước 4: Nhập Key (JS Injection)
         logger.info(f"[{PROJECT_NAME}] Đang nhập mnemonic...")
-        time.sleep(1) # Chờ animation
+        emit("Đang nhập mnemonic", step="inject_mnemonic")
         wait_for_element_safe('//input', timeout=10, name="Các ô nhập Key")
         
         if inject_mnemonic_js(mnemonic_phrase):
             logger.info("Dã tiêm JS nhập Key thành công.")
         else:
             raise Exception("Không thể thực hiện JS Injection")
+        clock.lap("inject_mnemonic")
 
         # Bước 5: Xác nhận
         confirm_btn = wait_for_element_safe([
@@ -174,6 +152,7 @@ def run(profile_data):
             '//button[contains(., "Confirm") or contains(., "Xác nhận")]'
         ], name="Nút Xác nhận Key")
         driver.execute_script("arguments[0].click();", confirm_btn)
+        clock.lap("confirm_mnemonic")
 
         # Bước 6: Password
         # Chọn "Password" nếu có danh sách lựa chọn
@@ -184,7 +163,7 @@ def run(profile_data):
         except: pass
 
         # Nhập pass
-        pass_inputs = wait_for_element_safe('//input[@type="password"]', timeout=10, name="Ô nhập mật khẩu")
+        wait_for_element_safe('//input[@type="password"]', timeout=10, name="Ô nhập mật khẩu")
         inputs = driver.find_elements(By.XPATH, '//input[@type="password"]')
         for inp in inputs:
             inp.send_keys(password)
@@ -192,24 +171,21 @@ def run(profile_data):
         # Click Final
         final_btn = wait_for_element_safe('//button[contains(@class, "btn-fill-highlight") or contains(., "Confirm")]', name="Xác nhận cuối")
         driver.execute_script("arguments[0].click();", final_btn)
+        clock.lap("set_password")
 
         # Bước 7: Bắt đầu
         start_btn = wait_for_element_safe('//*[contains(text(), "Bắt đầu") or contains(text(), "Start")]', timeout=10, name="Bắt đầu hành trình")
         driver.execute_script("arguments[0].click();", start_btn)
+        clock.lap("finish")
 
-        logger.info(f">>> [SUCCESS] Hoàn tất cho profile: {profile_data.get('profile_id')}")
+        logger.info(f">>> [SUCCESS] Hoàn tất cho profile: {ctx.profile_id}")
+        emit("Hoàn tất import ví OKX")
 
     except Exception as e:
         logger.error(f">>> [ERROR] Thất bại: {str(e)}")
+        emit(f"Thất bại: {str(e)}", level="error")
         # Có thể chụp ảnh màn hình lỗi ở đây nếu cần
         raise
-    finally:
-        if driver:
-            try: driver.quit()
-            except: pass
-
-if __name__ == "__main__":
-    run({"remote_debugging_address": "127.0.0.1:9222", "mnemonic": "test test test", "profile_id": "test"})
 
 if __name__ == "__main__":
     # Test sample
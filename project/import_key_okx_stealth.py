@@ -1,14 +1,16 @@
 # -*- coding: utf-8 -*-
-import json
 import time
-import requests
-import websocket
 import logging
+from cdp_client import get_browser, CDPError
+from element_wait import wait_for_element_cdp
+from navigation import NavigationTimeout, navigate_cdp
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("OKX_Stealth")
 
+OKX_EXTENSION_ID = "mcohilncbfahbmgdjkbpemcciiolgcge"
+
 def run(profile_data):
     """
     Script automation cho ví OKX dùng Raw CDP (Chrome DevTools Protocol)
@@ -21,102 +23,71 @@ def run(profile_data):
     
     logger.info(f">>> [{PROJECT_NAME}] Bắt đầu kết nối tới: {debug_address}...")
     
-    def send_cdp_command(ws, method, params=None):
-        msg_id = int(time.time() * 1000)
-        message = {
-            "id": msg_id,
-            "method": method,
-            "params": params or {}
-        }
-        ws.send(json.dumps(message))
-        # Chờ kết quả phản hồi đúng ID
-        while True:
-            res = json.loads(ws.recv())
-            if res.get('id') == msg_id:
-                return res
-            # Bỏ qua các events notification khác (như console.log)
-
-    def evaluate_js(ws, code):
+    def evaluate_js(page, code):
         """Thực thi mã Javascript và trả về giá trị thực tế"""
-        res = send_cdp_command(ws, "Runtime.evaluate", {
-            "expression": code,
-            "userGesture": True,
-            "awaitPromise": True,
-            "returnByValue": True
-        })
-        # Log lỗi nếu có
-        if "exceptionDetails" in res.get("result", {}):
-            logger.error(f"JS Error: {res['result']['exceptionDetails']}")
+        try:
+            return page.evaluate(code)
+        except CDPError as e:
+            # Log lỗi nếu có
+            logger.error(f"{e}")
             return None
-            
-        val = res.get('result', {}).get('result', {}).get('value')
-        return val
 
-    def wait_for_element_and_click(ws, selector, timeout=12, name="Element"):
-        """Đợi element xuất hiện và click, trả về True nếu thành công"""
+    def wait_for_element_and_click(page, selector, timeout=12, name="Element"):
+        """Đợi element xuất hiện (MutationObserver trong trang) và click, trả về True nếu thành công"""
         logger.info(f"Đang tìm và click {name} ({selector})...")
-        start = time.time()
-        while time.time() - start < timeout:
-            # Script tìm element thông minh (selector hoặc text)
-            click_js = f"""
-            (function() {{
-                const el = document.querySelector('{selector}') || 
-                           Array.from(document.querySelectorAll('button, div, span')).find(e => e.textContent.trim().toLowerCase().includes('{selector.lower()}'));
-                if (el && el.offsetHeight > 0) {{
-                    el.click();
-                    return true;
-                }}
-                return false;
-            }})()
-            """
-            if evaluate_js(ws, click_js) == True:
-                return True
-            time.sleep(1)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            # Thử selector trước, sau đó tìm theo text
+            try:
+                if wait_for_element_cdp(page, [f"css={selector}", f"text={selector}"],
+                                        timeout=deadline - time.time(), click=True):
+                    return True
+            except CDPError:
+                # Trang đang chuyển (context bị huỷ), chờ một chút rồi thử lại
+                time.sleep(0.2)
         logger.error(f"Timeout: Không thể click {name}")
         return False
 
+    def wait_until_visible(page, locators, timeout=10, name="Element"):
+        """Chờ màn hình tiếp theo thay cho time.sleep cố định; trả về số giây đã chờ"""
+        try:
+            waited = navigate_cdp(page, locators=locators, timeout=timeout)
+            logger.info(f"{name} sẵn sàng sau {waited:.2f}s")
+            return waited
+        except (NavigationTimeout, CDPError) as e:
+            logger.warning(f"Chưa thấy {name}: {e}")
+            return None
+
     try:
-        # Bước 1: Tìm Tab OKX qua API /json
-        json_url = f"http://{debug_address}/json"
-        target_ws_url = None
+        # Bước 1: Tìm Tab OKX qua kết nối CDP dùng chung của trình duyệt
+        browser = get_browser(debug_address)
+        page = None
         
-        for i in range(15):
-            try:
-                tabs = requests.get(json_url, timeout=5).json()
-                for tab in tabs:
-                    if "mcohilncbfahbmgdjkbpemcciiolgcge" in tab.get('url', '') and "background" not in tab.get('url', ''):
-                        target_ws_url = tab.get('webSocketDebuggerUrl')
-                        break
-                if target_ws_url: break
-                logger.info(f"Đang quét tab OKX (Lần {i+1})...")
-            except: pass
-            time.sleep(2)
+        try:
+            page = browser.attach_page(url_contains=OKX_EXTENSION_ID, exclude=["background"])
+        except CDPError: pass
             
-        if not target_ws_url:
-            # Cố mở trang initialize nếu không thấy
+        if not page:
+            # Cố mở trang initialize nếu không thấy (chờ sự kiện load thay vì sleep)
             logger.info("Mở tab OKX mới...")
             try:
-                tabs = requests.get(json_url).json()
-                ws_temp = create_ws_connection(tabs[0].get('webSocketDebuggerUrl'))
-                evaluate_js(ws_temp, "window.open('chrome-extension://mcohilncbfahbmgdjkbpemcciiolgcge/popup.html#/initialize', '_blank')")
-                ws_temp.close()
-                time.sleep(3)
-                tabs = requests.get(json_url).json()
-                target_ws_url = next((t['webSocketDebuggerUrl'] for t in tabs if "mcohilncbfahbmgdjkbpemcciiolgcge" in t['url']), None)
-            except: pass
-
-        if not target_ws_url: raise Exception("Không tìm thấy Tab OKX")
-
-        ws = create_ws_connection(target_ws_url)
+                page = browser.new_page()
+                waited = navigate_cdp(page, f"chrome-extension://{OKX_EXTENSION_ID}/popup.html#/initialize",
+                                      wait_until="load", timeout=15)
+                logger.info(f"Tab OKX đã tải xong sau {waited:.2f}s")
+            except (CDPError, NavigationTimeout) as e:
+                logger.error(f"Không mở được tab OKX: {e}")
+
+        if not page: raise Exception("Không tìm thấy Tab OKX")
         logger.info("Kết nối Stealth CDP thành công!")
 
         # Bước 3 + 4: Điều hướng tới trang nhập Key
-        if not wait_for_element_and_click(ws, "import-wallet-button", name="Nút Import"):
+        if not wait_for_element_and_click(page, "import-wallet-button", name="Nút Import"):
             # Thử phương án dự phòng nếu đang ở màn hình khác
-            wait_for_element_and_click(ws, "seed-phrase", name="Nút Seed Phrase")
+            wait_for_element_and_click(page, "seed-phrase", name="Nút Seed Phrase")
 
-        wait_for_element_and_click(ws, "import-seed-phrase-or-private-key", name="Nút Import Key")
-        time.sleep(2)
+        wait_for_element_and_click(page, "import-seed-phrase-or-private-key", name="Nút Import Key")
+        wait_until_visible(page, ["input"], name="Ô nhập mnemonic")
 
         # Bước 5: Nhập Mnemonic (PHƯƠNG PHÁP SIÊU BỀN)
         logger.info("Bắt đầu tiêm Mnemonic...")
@@ -159,24 +130,26 @@ def run(profile_data):
             return "DONE_INJECT";
         }})()
         """
-        result = evaluate_js(ws, inject_js)
+        result = evaluate_js(page, inject_js)
         logger.info(f"Kết quả Injection: {result}")
-        time.sleep(1)
 
         # Bước 6: Xác nhận Verify
-        if not wait_for_element_and_click(ws, "confirm-button", name="Xác nhận Key"):
+        if not wait_for_element_and_click(page, "confirm-button", name="Xác nhận Key"):
             # Thử click theo text nếu selector test-id thay đổi
-            evaluate_js(ws, "Array.from(document.querySelectorAll('button')).find(b => b.textContent.includes('Confirm') || b.textContent.includes('Xác nhận'))?.click()")
+            evaluate_js(page, "Array.from(document.querySelectorAll('button')).find(b => b.textContent.includes('Confirm') || b.textContent.includes('Xác nhận'))?.click()")
         
-        time.sleep(2)
+        wait_until_visible(page, ["text=Password", 'input[type="password"]'], name="Màn hình Password")
 
         # Bước 7 + 8: Password
         logger.info("Thiết lập Password...")
         # Chọn Password mode (nếu có lựa chọn)
-        evaluate_js(ws, "Array.from(document.querySelectorAll('div')).find(e => e.textContent.includes('Password'))?.click()")
-        time.sleep(0.5)
-        evaluate_js(ws, "Array.from(document.querySelectorAll('button')).find(e => e.textContent.includes('Next') || e.textContent.includes('Tiếp')).click()")
-        time.sleep(1)
+        evaluate_js(page, "Array.from(document.querySelectorAll('div')).find(e => e.textContent.includes('Password'))?.click()")
+        try:
+            # Nút Next hiện ra khi đã chọn mode; nếu đã ở ô mật khẩu thì bỏ qua
+            wait_for_element_cdp(page, ['//button[contains(., "Next") or contains(., "Tiếp")]', 'input[type="password"]'],
+                                 timeout=5, click=True)
+        except CDPError: pass
+        wait_until_visible(page, ['input[type="password"]'], name="Ô nhập mật khẩu")
 
         # Điền mật khẩu
         set_pass_js = f"""
@@ -191,17 +164,16 @@ def run(profile_data):
             return inputs.length;
         }})()
         """
-        num_pass = evaluate_js(ws, set_pass_js)
+        num_pass = evaluate_js(page, set_pass_js)
         logger.info(f"Đã điền mật khẩu vào {num_pass} ô.")
         
-        wait_for_element_and_click(ws, "confirm", name="Xác nhận mật khẩu")
-        time.sleep(3)
+        wait_for_element_and_click(page, "confirm", name="Xác nhận mật khẩu")
 
         # Bước 9: Finish
-        wait_for_element_and_click(ws, "start", name="Bắt đầu hành trình")
+        wait_for_element_and_click(page, "start", name="Bắt đầu hành trình")
         
         logger.info(f">>> [SUCCESS] Hoàn tất nạp ví OKX cho profile {profile_data.get('profile_id')}!")
-        ws.close()
+        page.detach()
 
     except Exception as e:
         logger.error(f">>> [ERROR] Lỗi Stealth CDP: {e}")
@@ -22,6 +22,8 @@ from selenium.common.exceptions import (
 )
 import time
 
+from element_wait import wait_for_element
+
 
 # ============================================================================
 # 1. KHỞI TẠO DRIVER (INITIALIZATION)
@@ -487,20 +489,17 @@ def find_element_multiple_strategies(driver, timeout=10):
         (By.XPATH, "//input[@data-testid='search-input']"),
     ]
     
-    for locator_type, locator_value in locators:
-        try:
-            element = WebDriverWait(driver, timeout).until(
-                EC.element_to_be_clickable((locator_type, locator_value))
-            )
-            print(f"[OK] Found element using: {locator_value}")
-            return element
-            
-        except TimeoutException:
-            print(f"[!] Not found using: {locator_value}")
-            continue
-    
-    # Nếu tất cả đều fail
-    raise Exception("Could not find element with any strategy")
+    # KHÔNG thử từng locator với WebDriverWait riêng: locator đầu bị hỏng sẽ tốn trọn timeout
+    # trước khi thử cái tiếp theo. Gửi TẤT CẢ vào trang một lần, chờ cái nào xuất hiện trước.
+    try:
+        element, idx = wait_for_element(
+            driver, locators, timeout=timeout, name="search-box", with_index=True, adaptive=True
+        )
+    except TimeoutException:
+        # Nếu tất cả đều fail
+        raise Exception("Could not find element with any strategy")
+    print(f"[OK] Found element using: {locators[idx][1]}")
+    return element
 
 
 # ============================================================================
@@ -719,19 +718,14 @@ def complete_action_template(driver, action_name, locator_strategies):
         # Step 1: Tìm element với nhiều strategies
         print(f"\n[1/3] Looking for element...")
         
-        for idx, (locator_type, locator_value) in enumerate(locator_strategies, 1):
-            try:
-                element = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((locator_type, locator_value))
-                )
-                print(f"[OK] Found using strategy #{idx}: {locator_value}")
-                break
-            except TimeoutException:
-                print(f"[!] Strategy #{idx} failed: {locator_value}")
-                continue
-        
-        if not element:
+        # Mọi strategy được đánh giá cùng lúc trong trang (1 round trip, không chờ 5s cho mỗi cái)
+        try:
+            element, idx = wait_for_element(
+                driver, locator_strategies, timeout=5, name=action_name, with_index=True, adaptive=True
+            )
+        except TimeoutException:
             raise Exception("Could not find element with any strategy")
+        print(f"[OK] Found using strategy #{idx + 1}: {locator_strategies[idx][1]}")
         
         # Step 2: Highlight element (optional - for debugging)
         print(f"\n[2/3] Highlighting element...")
@@ -5,106 +5,73 @@ Automation cho các tác vụ trên Twitter/X
 """
 import encoding_fix  # Fix Windows console encoding - must be first import
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
+from selenium.common.exceptions import TimeoutException
+from gpm_runtime import automation, wait_for_element
 
+# Ask the API server for a pooled, already attached WebDriver (profile_data["driver"])
+USE_DRIVER_POOL = True
 
-def run(profile_data):
+LOGIN_BUTTON_XPATH = '//*[text()="Đăng nhập vào X"]'
+POST_BUTTON_XPATH = "//a[@aria-label='Post']"
+
+
+# Only text and the DOM are checked: skip images, video and fonts (saves proxy bandwidth)
+@automation(block_resources=("Image", "Media", "Font"))
+def run(ctx):
     """
     Main function to run Twitter automation
     
     Args:
-        profile_data: Dict containing:
-            - profile_id: Profile ID
-            - profile_name: Profile name
-            - remote_debugging_address: e.g., "127.0.0.1:53378"
-            - browser_location: Path to browser executable
-            - driver_path: Path to ChromeDriver
+        ctx: gpm_runtime.RunContext built from profile_data:
+            - ctx.address: remote_debugging_address, e.g., "127.0.0.1:53378"
+            - ctx.driver: Attached WebDriver (server pool, or attached on first use)
+            - ctx.params: Extra query parameters
     """
-    print(f">>> [TWITTER] Connecting to browser at: {profile_data['remote_debugging_address']}...")
-    
-    driver = None
+    print(f">>> [TWITTER] Connecting to browser at: {ctx.address}...")
     
     try:
-        # Connect to the already opened browser profile
-        chrome_options = Options()
-        chrome_options.add_experimental_option(
-            "debuggerAddress", 
-            profile_data['remote_debugging_address']
-        )
-        
-        print(f">>> [TWITTER] Initializing WebDriver (Connecting to browser)...")
-        try:
-            from selenium.webdriver.chrome.service import Service
-            
-            # Using specific driver_path from GPM if available
-            driver_path = profile_data.get('driver_path')
-            if driver_path:
-                print(f">>> [TWITTER] Using specific driver: {driver_path}")
-                service = Service(executable_path=driver_path)
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-            else:
-                print(">>> [TWITTER] Using default system driver")
-                driver = webdriver.Chrome(options=chrome_options)
-                
-        except Exception as chrome_err:
-            print(f">>> [ERROR] Selenium could not connect to browser: {chrome_err}")
-            print(">>> [TIP] Có thể driver_path không đúng hoặc trình duyệt chưa hỗ trợ Remote Debugging.")
-            return
-            
-        print(f">>> [TWITTER] WebDriver initialized successfully!")
+        driver = ctx.driver
+        print(">>> [TWITTER] WebDriver initialized successfully!")
         
         # Step 0: Ensure we are using the correct window/tab
-        print(f">>> [TWITTER] Scanning for a valid browser tab...")
-        all_handles = driver.window_handles
-        target_handle = None
+        print(">>> [TWITTER] Scanning for a valid browser tab...")
+        tab = ctx.select_tab(web_only=True)
         
-        for handle in all_handles:
-            driver.switch_to.window(handle)
-            current_url = driver.current_url
-            print(f">>> [TWITTER] Window {handle[:8]}: {current_url}")
-            
-            # Skip extension background pages and other internal chrome pages
-            if not current_url.startswith("chrome-extension://") and not current_url.startswith("chrome://"):
-                target_handle = handle
-                break
-        
-        if not target_handle:
+        if not tab:
             print(">>> [TWITTER] No active web tab found. Creating a new one...")
-            driver.execute_script("window.open('about:blank', '_blank');")
-            driver.switch_to.window(driver.window_handles[-1])
+            ctx.new_tab()
         else:
-            print(f">>> [TWITTER] Selected valid tab: {driver.current_url}")
+            print(f">>> [TWITTER] Selected valid tab: {tab['url']}")
+        ctx.lap("select_tab")
         
         # Step 1: Navigate to Twitter home
         target_url = "https://x.com/home"
         print(f">>> [TWITTER] Navigating to {target_url}...")
-        driver.get(target_url)
-        time.sleep(2) # Wait for page start
-        print(f">>> [TWITTER] Navigation complete! New URL: {driver.current_url}")
+        # Wait for DOMContentLoaded (not a fixed sleep); X redirects to the login flow when logged out
+        waited = ctx.navigate(target_url, wait_until="DOMContentLoaded", timeout=20)
+        print(f">>> [TWITTER] Navigation complete in {waited:.1f}s! New URL: {driver.current_url}")
+        ctx.lap("navigate")
         
-        # VISUAL FEEDBACK: Scroll down then up
+        # VISUAL FEEDBACK: Scroll down then back up (the way back is scheduled in the page, no sleep here)
         print(">>> [TWITTER] Performing visual feedback (Scrolling)...")
-        driver.execute_script("window.scrollTo(0, 500);")
-        time.sleep(1)
-        driver.execute_script("window.scrollTo(0, 0);")
+        driver.execute_script("window.scrollTo(0, 500); setTimeout(() => window.scrollTo(0, 0), 1000);")
         
         # Step 2: Check login status
-        print(">>> [TWITTER] Checking for login button (timeout 10s)...")
+        # Race the login button against the timeline: whichever shows up first decides (no 10s timeout when logged in)
+        print(">>> [TWITTER] Checking login status (timeout 10s)...")
         try:
-            # Wait for the login button
-            login_button = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '//*[text()="Đăng nhập vào X"]'))
+            element, index = wait_for_element(
+                driver, [LOGIN_BUTTON_XPATH, POST_BUTTON_XPATH], timeout=10, name="Login/Timeline", with_index=True
             )
+        except TimeoutException:
+            element, index = None, None
+        ctx.lap("check_login")
+
+        if index == 0:
             print(">>> [TWITTER] RESULT: Not logged in. Highlighting button.")
-            driver.execute_script("arguments[0].style.border='5px solid red'; arguments[0].style.backgroundColor='yellow';", login_button)
+            driver.execute_script("arguments[0].style.border='5px solid red'; arguments[0].style.backgroundColor='yellow';", element)
             
-        except TimeoutException:
+        else:
             print("[OK] ALREADY LOGGED IN")
             # Draw a visual box to confirm connection
             confirm_js = """
@@ -123,11 +90,8 @@ def run(profile_data):
             """
             driver.execute_script(confirm_js)
             
-            try:
-                driver.find_element(By.XPATH, "//a[@aria-label='Post']")
+            if index == 1:
                 print("[OK] Timeline loaded")
-            except:
-                pass
         
     except Exception as e:
         print(f"[ERROR] Twitter Automation: {e}")
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Fast tab discovery through the DevTools /json endpoint
+
+Looping over driver.window_handles with switch_to.window() + current_url
+costs two WebDriver round trips per tab and activates background pages on
+the way. Instead, read http://{debug_address}/json once, keep only real
+page targets (no service workers, extension backgrounds, offscreen
+documents...), and switch Selenium straight to the matching handle:
+chromedriver's window handle is the DevTools target id.
+
+    from tab_discovery import switch_to_tab
+
+    tab = switch_to_tab(driver, address, web_only=True)
+    tab = switch_to_tab(driver, address, url_contains="mcohilncbfahbmgdjkbpemcciiolgcge")
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from cdp_client import list_targets
+
+CACHE_TTL = 1.0  # Seconds a /json listing is reused
+IGNORED_URL_PARTS = ("offscreen.html", "background.html", "generated_background", "service_worker")
+INTERNAL_URL_PREFIXES = ("chrome-extension://", "chrome://", "devtools://", "chrome-untrusted://")
+
+_cache = {}  # debug_address -> (fetched_at, [page targets])
+_lock = threading.Lock()
+
+
+def list_tabs(debug_address: str, max_age: float = CACHE_TTL) -> List[Dict[str, Any]]:
+    """Visible page targets of the browser (briefly cached per address)"""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(debug_address)
+    if entry and now - entry[0] < max_age:
+        return entry[1]
+    tabs = [
+        t for t in list_targets(debug_address)
+        if t.get("type") == "page" and not any(part in t.get("url", "") for part in IGNORED_URL_PARTS)
+    ]
+    with _lock:
+        _cache[debug_address] = (now, tabs)
+    return tabs
+
+
+def invalidate(debug_address: str):
+    with _lock:
+        _cache.pop(debug_address, None)
+
+
+def find_tab(
+    debug_address: str,
+    url_contains: Optional[str] = None,
+    web_only: bool = False,
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    max_age: float = CACHE_TTL
+) -> Optional[Dict[str, Any]]:
+    """First tab matching every given filter; re-reads /json once before giving up"""
+    def matches(tab):
+        url = tab.get("url", "")
+        if url_contains and url_contains not in url:
+            return False
+        if web_only and url.startswith(INTERNAL_URL_PREFIXES):
+            return False
+        return predicate(tab) if predicate else True
+
+    for age in (max_age, 0):
+        tab = next((t for t in list_tabs(debug_address, max_age=age) if matches(t)), None)
+        if tab:
+            return tab
+    return None
+
+
+def target_to_handle(driver, target_id: str) -> Optional[str]:
+    """Selenium window handle for a DevTools target id (one WebDriver round trip)"""
+    target_id = target_id.upper()
+    for handle in driver.window_handles:
+        # Current chromedriver uses the bare target id, older ones "CDwindow-<id>"
+        if handle.upper().endswith(target_id):
+            return handle
+    return None
+
+
+def switch_to_tab(
+    driver,
+    debug_address: str,
+    url_contains: Optional[str] = None,
+    web_only: bool = False,
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> Optional[Dict[str, Any]]:
+    """Switch driver to the first matching tab (filters as in find_tab); returns the target or None"""
+    filters = {"url_contains": url_contains, "web_only": web_only, "predicate": predicate}
+    tab = find_tab(debug_address, **filters)
+    if not tab:
+        return None
+    handle = target_to_handle(driver, tab["id"])
+    if handle is None:
+        # Listing is older than the tab set (tab closed meanwhile): retry on a fresh one
+        invalidate(debug_address)
+        tab = find_tab(debug_address, max_age=0, **filters)
+        handle = target_to_handle(driver, tab["id"]) if tab else None
+        if handle is None:
+            return None
+    driver.switch_to.window(handle)
+    return tab